@@ -0,0 +1,302 @@
+import csv
+import uuid
+from argparse import BooleanOptionalAction
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from main.logger import CustomLogger
+from main.models import Applicant, Match, Mentor
+
+# new_matches_<round>.csv columns (tools/Matcher/mentors.py new_matches_frame)
+REQUIRED_COLUMNS = ("applicant1_id", "applicant2_id", "mentor_id", "round")
+OPTIONAL_COLUMNS = (
+    "name",
+    "applicant1_status",
+    "applicant2_status",
+    "discarded",
+    "discard_reason",
+)
+
+# the reason 05_round1_end gives to the matches nobody confirmed
+TIMEOUT_DISCARD_REASON = "匹配确认超时, 系统自动废弃"
+
+logger = CustomLogger("write_matches")
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _uuid(value: str) -> uuid.UUID:
+    # the notebooks read ids as SQLite stores them (hex without dashes), while
+    # cache keys use str(UUID)
+    try:
+        return uuid.UUID(value.strip())
+    except ValueError:
+        raise CommandError(f"Not an id: {value!r}") from None
+
+
+def _match_id(value: str) -> int:
+    try:
+        return int(value.strip())
+    except ValueError:
+        raise CommandError(f"Not a match id: {value!r}") from None
+
+
+def _read_matches(path: str) -> list[dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [
+            column
+            for column in REQUIRED_COLUMNS
+            if column not in (reader.fieldnames or [])
+        ]
+        if missing:
+            raise CommandError(f"{path} is missing the columns {', '.join(missing)}")
+        rows = []
+        for row in reader:
+            fields = {column: _uuid(row[column]) for column in REQUIRED_COLUMNS[:3]}
+            fields["round"] = int(row["round"])
+            for column in OPTIONAL_COLUMNS:
+                # empty cells keep the model default
+                if row.get(column):
+                    fields[column] = row[column]
+            if "discarded" in fields:
+                fields["discarded"] = fields["discarded"].strip().lower() in (
+                    "1",
+                    "true",
+                )
+            rows.append(fields)
+    return rows
+
+
+def _read_ids(path: str, parse=_uuid) -> list:
+    """One id per line, no header (e.g. no_response_applicants.csv)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [parse(row[0]) for row in csv.reader(f) if row and row[0].strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes new_matches_<round>.csv (tools/Matcher) to the match table, "
+        "confirms applicants and discards matches, in one transaction, then "
+        "invalidates their cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("matches", nargs="?", help="new_matches_<round>.csv")
+        parser.add_argument(
+            "--confirm",
+            action=BooleanOptionalAction,
+            default=None,
+            help="Set confirmed on the applicants of the matches "
+            "(default: for round 2 matches only)",
+        )
+        parser.add_argument(
+            "--confirm-ids",
+            help="CSV of further applicant ids to set confirmed on, one per line "
+            "(05_round1_end)",
+        )
+        parser.add_argument(
+            "--discard-ids",
+            help="CSV of match ids to discard, one per line (05_round1_end)",
+        )
+        parser.add_argument(
+            "--discard-reason",
+            default=TIMEOUT_DISCARD_REASON,
+            help="discard_reason of the discarded matches (default: %(default)s)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only validate and report"
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Do not ask for confirmation",
+        )
+
+    def handle(self, *args, **options):
+        if not any(options[key] for key in ("matches", "confirm_ids", "discard_ids")):
+            raise CommandError(
+                "Nothing to write: give a matches CSV, --confirm-ids and / or "
+                "--discard-ids"
+            )
+        batch_size = options["batch_size"]
+
+        rows = _read_matches(options["matches"]) if options["matches"] else []
+        matched_ids = [
+            row[column] for row in rows for column in ("applicant1_id", "applicant2_id")
+        ]
+        confirm_ids = [
+            applicant_id
+            for row in rows
+            if options["confirm"] or (options["confirm"] is None and row["round"] == 2)
+            for applicant_id in (row["applicant1_id"], row["applicant2_id"])
+        ]
+        if options["confirm_ids"]:
+            confirm_ids += _read_ids(options["confirm_ids"])
+        confirm_ids = list(dict.fromkeys(confirm_ids))
+        discard_ids = (
+            list(dict.fromkeys(_read_ids(options["discard_ids"], _match_id)))
+            if options["discard_ids"]
+            else []
+        )
+
+        self._validate(rows, matched_ids, confirm_ids, batch_size)
+        discarded_applicant_ids = self._validate_discards(discard_ids, batch_size)
+
+        self.stdout.write(
+            f"{len(rows)} matches to create, {len(confirm_ids)} applicants to "
+            f"confirm, {len(discard_ids)} matches to discard"
+        )
+        if options["dry_run"]:
+            self._check_unmatched(rows, matched_ids, batch_size)
+            return
+        if options["interactive"] and input("Type 'yes' to write them: ") != "yes":
+            raise CommandError("Aborted")
+
+        cache_keys = self._cache_keys(
+            matched_ids + discarded_applicant_ids, confirm_ids, batch_size
+        )
+        matches = [Match(**row) for row in rows]
+        confirmed = discarded = 0
+        with transaction.atomic():
+            # discard first, so a discarded match does not block a new one
+            # of the same file; update() skips auto_now
+            now = timezone.now()
+            for chunk in _chunks(discard_ids, batch_size):
+                discarded += Match.objects.filter(id__in=chunk, discarded=False).update(
+                    discarded=True,
+                    discard_reason=options["discard_reason"],
+                    updated_at=now,
+                )
+            # SQLite ignores the row locks, but a second run that got past
+            # the check cannot take the write lock and is rolled back
+            for chunk in _chunks(matched_ids, batch_size):
+                list(Applicant.objects.select_for_update().filter(id__in=chunk))
+            self._check_unmatched(rows, matched_ids, batch_size)
+            Match.objects.bulk_create(matches, batch_size=batch_size)
+            for chunk in _chunks(confirm_ids, batch_size):
+                confirmed += Applicant.objects.filter(id__in=chunk).update(
+                    confirmed=True
+                )
+
+        # bulk_create / update() skip the models' save(), so invalidate what
+        # Match.save() and Applicant.save() would have; django-redis sends
+        # delete_many as a single DEL
+        if cache_keys:
+            cache.delete_many(cache_keys)
+
+        message = (
+            f"Created {len(matches)} matches, confirmed {confirmed} applicants, "
+            f"discarded {discarded} matches, invalidated {len(cache_keys)} cache keys"
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def _validate(
+        self,
+        rows: list[dict],
+        matched_ids: list[uuid.UUID],
+        confirm_ids: list[uuid.UUID],
+        batch_size: int,
+    ) -> None:
+        duplicates = [
+            str(applicant_id)
+            for applicant_id, count in Counter(matched_ids).items()
+            if count > 1
+        ]
+        if duplicates:
+            raise CommandError(
+                f"Applicants in more than one match: {', '.join(duplicates)}"
+            )
+
+        applicant_ids = list(dict.fromkeys(matched_ids + confirm_ids))
+        found = set()
+        for chunk in _chunks(applicant_ids, batch_size):
+            found.update(
+                Applicant.objects.filter(id__in=chunk).values_list("id", flat=True)
+            )
+        unknown = [
+            str(applicant_id)
+            for applicant_id in applicant_ids
+            if applicant_id not in found
+        ]
+        if unknown:
+            raise CommandError(f"Unknown applicants: {', '.join(unknown)}")
+
+        mentor_ids = list({row["mentor_id"] for row in rows})
+        found = set(
+            Mentor.objects.filter(id__in=mentor_ids).values_list("id", flat=True)
+        )
+        unknown = [str(mentor_id) for mentor_id in mentor_ids if mentor_id not in found]
+        if unknown:
+            raise CommandError(f"Unknown mentors: {', '.join(unknown)}")
+
+    def _validate_discards(
+        self, discard_ids: list[int], batch_size: int
+    ) -> list[uuid.UUID]:
+        """Checks that the matches exist; returns the ids of their applicants."""
+        found = {}
+        for chunk in _chunks(discard_ids, batch_size):
+            for match_id, applicant1_id, applicant2_id in Match.objects.filter(
+                id__in=chunk
+            ).values_list("id", "applicant1_id", "applicant2_id"):
+                found[match_id] = (applicant1_id, applicant2_id)
+        unknown = [str(match_id) for match_id in discard_ids if match_id not in found]
+        if unknown:
+            raise CommandError(f"Unknown matches: {', '.join(unknown)}")
+        return [
+            applicant_id
+            for applicant_ids in found.values()
+            for applicant_id in applicant_ids
+            if applicant_id is not None
+        ]
+
+    def _check_unmatched(
+        self, rows: list[dict], matched_ids: list[uuid.UUID], batch_size: int
+    ) -> None:
+        """
+        Re-running the same file must not match anyone twice. Called inside
+        the writing transaction, after the applicants' rows are locked, so a
+        concurrent run cannot pass the check before this one commits.
+        """
+        rounds = {row["round"] for row in rows}
+        for chunk in _chunks(matched_ids, batch_size):
+            existing = Match.objects.filter(round__in=rounds, discarded=False).filter(
+                Q(applicant1_id__in=chunk) | Q(applicant2_id__in=chunk)
+            )
+            if existing.exists():
+                rounds_text = ", ".join(map(str, sorted(rounds)))
+                raise CommandError(
+                    f"Applicants already have a match of round {rounds_text}, "
+                    f"e.g. match {existing.first().id}"
+                )
+
+    def _cache_keys(
+        self,
+        matched_ids: list[uuid.UUID],
+        confirm_ids: list[uuid.UUID],
+        batch_size: int,
+    ) -> list[str]:
+        keys = [f"match:applicant:{applicant_id}" for applicant_id in matched_ids]
+        # cached Applicant objects carry confirmed
+        for chunk in _chunks(confirm_ids, batch_size):
+            for applicant_id, openid, token in Applicant.objects.filter(
+                id__in=chunk
+            ).values_list("id", "wechat_info__openid", "wechat_info__token__token"):
+                keys.append(f"match:applicant:{applicant_id}")
+                if openid:
+                    keys.append(f"applicant:openid:{openid}")
+                if token:
+                    keys.append(f"token:{token}:applicant")
+        return list(dict.fromkeys(keys))
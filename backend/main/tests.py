@@ -1,3 +1,244 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from .models import Applicant, Match, Mentor, Token, WeChatInfo
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class WriteMatchesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.mentor = Mentor.objects.create(username="mentor", name="mentor")
+        self.applicants = [self.create_applicant(i) for i in range(5)]
+
+    def create_applicant(self, i: int) -> Applicant:
+        wechat_info = WeChatInfo.objects.create(
+            openid=f"openid{i}",
+            unionid=f"unionid{i}",
+            nickname=f"nickname{i}",
+            head_image_url="https://example.com/head.jpg",
+        )
+        Token.objects.create(wechat_info=wechat_info)
+        return Applicant.objects.create(
+            name=f"name{i}",
+            sex="F" if i % 2 else "M",
+            grade="UG1",
+            school="HKU",
+            major="major",
+            email=f"applicant{i}@example.com",
+            wxid=f"wxid{i}",
+            wechat_info=wechat_info,
+            mbti_ei=50,
+            mbti_sn=50,
+            mbti_tf=50,
+            mbti_jp=50,
+            preferred_sex="M" if i % 2 else "F",
+            preferred_grades="UG1",
+            preferred_schools="HKU",
+            preferred_mbti_ei="x",
+            preferred_mbti_sn="x",
+            preferred_mbti_tf="x",
+            preferred_mbti_jp="x",
+            hobbies="hobbies",
+            fav_movies="fav_movies",
+            wish="wish",
+            why_lamp_remembered_your_name="why",
+            weekend_arrangement="weekend",
+            reply_frequency="3",
+            expectation="expectation",
+        )
+
+    def write_matches_csv(self, pairs: list[tuple[int, int]], round_number: int) -> str:
+        """new_matches_<round>.csv as tools/Matcher writes it (ids as hex)."""
+        path = os.path.join(self.directory, f"new_matches_{round_number}.csv")
+        status = "P" if round_number == 1 else "A"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "applicant1_id",
+                    "applicant2_id",
+                    "mentor_id",
+                    "name",
+                    "round",
+                    "applicant1_status",
+                    "applicant2_status",
+                    "discarded",
+                    "discard_reason",
+                    "created_at",
+                    "updated_at",
+                ]
+            )
+            for i, j in pairs:
+                writer.writerow(
+                    [
+                        self.applicants[i].id.hex,
+                        self.applicants[j].id.hex,
+                        self.mentor.id.hex,
+                        "取个组名吧!",
+                        round_number,
+                        status,
+                        status,
+                        False,
+                        "",
+                        "2026-02-01 12:00:00",
+                        "2026-02-01 12:00:00",
+                    ]
+                )
+        return path
+
+    def call(self, *args):
+        call_command("write_matches", *args, "--noinput", stdout=StringIO())
+
+    def test_bulk_inserts_matches(self):
+        self.call(self.write_matches_csv([(0, 1), (2, 3)], 1))
+
+        matches = Match.objects.order_by("id")
+        self.assertEqual(
+            [(match.applicant1_id, match.applicant2_id) for match in matches],
+            [
+                (self.applicants[0].id, self.applicants[1].id),
+                (self.applicants[2].id, self.applicants[3].id),
+            ],
+        )
+        for match in matches:
+            self.assertEqual(match.mentor_id, self.mentor.id)
+            self.assertEqual(match.round, 1)
+            self.assertEqual(match.applicant1_status, "P")
+            self.assertFalse(match.discarded)
+            self.assertIsNone(match.discard_reason)
+        # round 1 matches are confirmed by the applicants themselves
+        self.assertFalse(Applicant.objects.filter(confirmed=True).exists())
+
+    def test_rerun_is_rejected(self):
+        path = self.write_matches_csv([(0, 1)], 1)
+        self.call(path)
+
+        with self.assertRaisesMessage(CommandError, "already have a match of round 1"):
+            self.call(path)
+        self.assertEqual(Match.objects.count(), 1)
+
+    def test_discarded_match_does_not_block(self):
+        self.call(self.write_matches_csv([(0, 1)], 1))
+        Match.objects.update(discarded=True)
+
+        self.call(self.write_matches_csv([(0, 2)], 1))
+        self.assertEqual(Match.objects.filter(discarded=False).count(), 1)
+
+    def test_round2_confirms_applicants(self):
+        self.call(self.write_matches_csv([(0, 1)], 2))
+
+        self.assertEqual(
+            set(Applicant.objects.filter(confirmed=True).values_list("id", flat=True)),
+            {self.applicants[0].id, self.applicants[1].id},
+        )
+        self.assertEqual(Match.objects.get().applicant1_status, "A")
+
+    def test_confirm_ids(self):
+        path = os.path.join(self.directory, "confirmed.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"{self.applicants[4].id.hex}\n")
+
+        self.call("--confirm-ids", path)
+
+        self.assertEqual(
+            list(Applicant.objects.filter(confirmed=True).values_list("id", flat=True)),
+            [self.applicants[4].id],
+        )
+        self.assertFalse(Match.objects.exists())
+
+    def write_ids_csv(self, ids: list) -> str:
+        path = os.path.join(self.directory, "ids.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{value}\n" for value in ids)
+        return path
+
+    def test_discard_ids(self):
+        self.call(self.write_matches_csv([(0, 1), (2, 3)], 1))
+        stale, kept = Match.objects.order_by("id")
+        for applicant in self.applicants:
+            cache.set(f"match:applicant:{applicant.id}", "stale")
+
+        self.call("--discard-ids", self.write_ids_csv([stale.id]))
+
+        stale.refresh_from_db()
+        self.assertTrue(stale.discarded)
+        self.assertEqual(stale.discard_reason, "匹配确认超时, 系统自动废弃")
+        kept.refresh_from_db()
+        self.assertFalse(kept.discarded)
+        for applicant in self.applicants[:2]:
+            self.assertIsNone(cache.get(f"match:applicant:{applicant.id}"))
+        for applicant in self.applicants[2:]:
+            self.assertEqual(cache.get(f"match:applicant:{applicant.id}"), "stale")
+
+    def test_discard_and_rematch_in_one_run(self):
+        self.call(self.write_matches_csv([(0, 1)], 1))
+        old = Match.objects.get()
+
+        self.call(
+            self.write_matches_csv([(0, 2)], 1),
+            "--discard-ids",
+            self.write_ids_csv([old.id]),
+            "--discard-reason",
+            "rematched",
+        )
+
+        old.refresh_from_db()
+        self.assertTrue(old.discarded)
+        self.assertEqual(old.discard_reason, "rematched")
+        self.assertEqual(Match.objects.filter(discarded=False).count(), 1)
+
+    def test_unknown_discard_id_is_rejected(self):
+        self.call(self.write_matches_csv([(0, 1)], 1))
+        match = Match.objects.get()
+
+        with self.assertRaisesMessage(CommandError, "Unknown matches: 12345"):
+            self.call("--discard-ids", self.write_ids_csv([match.id, 12345]))
+        match.refresh_from_db()
+        self.assertFalse(match.discarded)
+
+    def test_invalidates_cache_keys(self):
+        for applicant in self.applicants:
+            cache.set(f"match:applicant:{applicant.id}", "stale")
+            cache.set(f"applicant:openid:{applicant.wechat_info.openid}", "stale")
+            cache.set(f"token:{applicant.wechat_info.token.token}:applicant", "stale")
+
+        self.call(self.write_matches_csv([(0, 1)], 2))
+
+        for applicant in self.applicants[:2]:
+            self.assertIsNone(cache.get(f"match:applicant:{applicant.id}"))
+            self.assertIsNone(
+                cache.get(f"applicant:openid:{applicant.wechat_info.openid}")
+            )
+            self.assertIsNone(
+                cache.get(f"token:{applicant.wechat_info.token.token}:applicant")
+            )
+        # applicants outside the file keep their entries
+        other = self.applicants[2]
+        self.assertEqual(cache.get(f"match:applicant:{other.id}"), "stale")
+        self.assertEqual(
+            cache.get(f"applicant:openid:{other.wechat_info.openid}"), "stale"
+        )
+
+    def test_dry_run_writes_nothing(self):
+        call_command(
+            "write_matches",
+            self.write_matches_csv([(0, 1)], 2),
+            "--dry-run",
+            stdout=StringIO(),
+        )
+
+        self.assertFalse(Match.objects.exists())
+        self.assertFalse(Applicant.objects.filter(confirmed=True).exists())
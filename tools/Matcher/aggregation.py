@@ -0,0 +1,194 @@
+import numpy as np
+from scipy import sparse
+
+
+def _intersect(
+    a: sparse.csr_matrix, b: sparse.csr_matrix
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs stored in both a and b (a stored pair is a finite score, anything
+    else is -inf). Returns (rows, cols, a_data, b_data) of the common pairs.
+    """
+    a, b = a.tocoo(), b.tocoo()
+    n_cols = a.shape[1]
+    a_keys = a.row.astype(np.int64) * n_cols + a.col
+    b_keys = b.row.astype(np.int64) * n_cols + b.col
+    keys, a_index, b_index = np.intersect1d(
+        a_keys, b_keys, assume_unique=True, return_indices=True
+    )
+    return keys // n_cols, keys % n_cols, a.data[a_index], b.data[b_index]
+
+
+def aggregate_scores(
+    forward_preference,
+    forward_similarity,
+    backward_preference=None,
+    backward_similarity=None,
+    *,
+    max_score: float,
+    minmax_ratio: float,
+):
+    """
+    Combines the preference and similarity scores of both directions into the
+    final matrix handed to Matcher:
+
+        total = clip(preference + similarity, max=max_score)
+        final = minmax_ratio * min(total, backward_total.T)
+                + (1 - minmax_ratio) * max(total, backward_total.T)
+        final = clip(final, 0, max_score)
+
+    Args:
+        forward_*: from -> to score matrices.
+        backward_*: to -> from score matrices; leave them out for a same-pool
+                    (FF / MM) matrix, whose backward direction is its transpose.
+
+    Takes either dense arrays or scipy sparse matrices from
+    Scorer.calculate_sparse_score_matrix (stored entries are the finite
+    scores, everything else is -inf). Sparse input gives a CSR matrix that
+    stores only the pairs with a positive final score; every other pair is 0.
+    """
+    if backward_preference is None:
+        backward_preference, backward_similarity = forward_preference, forward_similarity
+    matrices = (
+        forward_preference,
+        forward_similarity,
+        backward_preference,
+        backward_similarity,
+    )
+
+    if not any(sparse.issparse(matrix) for matrix in matrices):
+        total = np.clip(forward_preference + forward_similarity, max=max_score)
+        backward_total = np.clip(backward_preference + backward_similarity, max=max_score)
+        low = np.minimum(total, backward_total.T)
+        high = np.maximum(total, backward_total.T)
+        final = minmax_ratio * low + (1 - minmax_ratio) * high
+        return np.clip(final, a_min=0, a_max=max_score)
+
+    forward_preference, forward_similarity, backward_preference, backward_similarity = (
+        sparse.csr_matrix(matrix) for matrix in matrices
+    )
+    shape = forward_preference.shape
+
+    def total(preference, similarity) -> sparse.csr_matrix:
+        rows, cols, a, b = _intersect(preference, similarity)
+        data = np.minimum(a + b, max_score)
+        return sparse.csr_matrix((data, (rows, cols)), shape=preference.shape)
+
+    rows, cols, forward, backward = _intersect(
+        total(forward_preference, forward_similarity),
+        total(backward_preference, backward_similarity).T.tocsr(),
+    )
+    low = np.minimum(forward, backward)
+    high = np.maximum(forward, backward)
+    final = np.clip(minmax_ratio * low + (1 - minmax_ratio) * high, 0, max_score)
+
+    keep = final > 0
+    return sparse.csr_matrix((final[keep], (rows[keep], cols[keep])), shape=shape)
+
+
+def _blocks(n: int, block_size: int) -> list[tuple[int, int]]:
+    return [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+
+def aggregate_scores_blocked(
+    forward_preference: np.ndarray,
+    forward_similarity: np.ndarray,
+    backward_preference: np.ndarray | None = None,
+    backward_similarity: np.ndarray | None = None,
+    *,
+    max_score: float,
+    minmax_ratio: float,
+    excluded_pairs: np.ndarray | list[tuple[int, int]] | None = None,
+    penalized_rows: np.ndarray | None = None,
+    penalized_columns: np.ndarray | None = None,
+    no_response_penalty: float = 0,
+    out: np.ndarray | None = None,
+    block_size: int = 1024,
+) -> np.ndarray:
+    """
+    Dense aggregate_scores with the round 2 adjustments, computed tile by
+    tile into a float32 matrix:
+
+        total = clip(preference + similarity, max=max_score)
+        total[:, penalized] -= no_response_penalty
+        final = minmax_ratio * min(total, backward_total.T)
+                + (1 - minmax_ratio) * max(total, backward_total.T)
+        final = clip(final, 0, max_score)
+        final[excluded pairs] = 0, and the diagonal of a same-pool matrix
+
+    Each (block_size, block_size) tile of the result reads the matching
+    tiles of the four inputs (the backward ones transposed) into three
+    reusable float64 scratch tiles, so besides out the peak memory is a few
+    MB instead of several float64 copies of the matrix. The inputs can be
+    memory-mapped (e.g. ScoreCheckpoint matrices) and so can out, e.g.
+    np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=...).
+    The values are those of aggregate_scores rounded to float32.
+
+    Args:
+        backward_*: to -> from score matrices; leave them out for a same-pool
+                    (FF / MM) matrix.
+        excluded_pairs: (row, col) pairs that must not be matched again, e.g.
+                    discarded matches; both orders are excluded in a
+                    same-pool matrix.
+        penalized_rows, penalized_columns: indices of row / column applicants
+                    who did not respond last round; everyone's total towards
+                    them drops by no_response_penalty. In a same-pool matrix
+                    rows and columns are the same applicants, so either
+                    works.
+        out: float32 (n, m) destination; allocated when not given.
+    """
+    same_pool = backward_preference is None
+    if same_pool:
+        backward_preference, backward_similarity = forward_preference, forward_similarity
+    n, m = forward_preference.shape
+    if out is None:
+        out = np.empty((n, m), dtype=np.float32)
+    elif out.shape != (n, m):
+        raise ValueError(f"out must have shape {(n, m)}")
+
+    row_penalty = column_penalty = None
+    if no_response_penalty and (penalized_rows is not None or penalized_columns is not None):
+        penalized_rows = np.asarray([] if penalized_rows is None else penalized_rows, dtype=np.int64)
+        penalized_columns = np.asarray([] if penalized_columns is None else penalized_columns, dtype=np.int64)
+        if same_pool:
+            penalized_rows = penalized_columns = np.union1d(penalized_rows, penalized_columns)
+        row_penalty = np.zeros((n, 1))
+        row_penalty[penalized_rows] = no_response_penalty
+        column_penalty = np.zeros(m)
+        column_penalty[penalized_columns] = no_response_penalty
+
+    forward_buffer = np.empty((block_size, block_size))
+    backward_buffer = np.empty((block_size, block_size))
+    high_buffer = np.empty((block_size, block_size))
+    for row_start, row_stop in _blocks(n, block_size):
+        for column_start, column_stop in _blocks(m, block_size):
+            rows, columns = slice(row_start, row_stop), slice(column_start, column_stop)
+            forward = forward_buffer[: row_stop - row_start, : column_stop - column_start]
+            np.add(forward_preference[rows, columns], forward_similarity[rows, columns], out=forward)
+            np.minimum(forward, max_score, out=forward)
+
+            backward = backward_buffer[: column_stop - column_start, : row_stop - row_start]
+            np.add(backward_preference[columns, rows], backward_similarity[columns, rows], out=backward)
+            np.minimum(backward, max_score, out=backward)
+            backward = backward.T
+
+            if row_penalty is not None:
+                forward -= column_penalty[columns]
+                backward -= row_penalty[rows]
+
+            high = high_buffer[: row_stop - row_start, : column_stop - column_start]
+            np.maximum(forward, backward, out=high)
+            low = np.minimum(forward, backward, out=forward)
+            low *= minmax_ratio
+            high *= 1 - minmax_ratio
+            low += high
+            np.clip(low, 0, max_score, out=out[rows, columns])
+
+    if excluded_pairs is not None:
+        excluded_rows, excluded_columns = np.asarray(excluded_pairs, dtype=np.int64).reshape(-1, 2).T
+        out[excluded_rows, excluded_columns] = 0
+        if same_pool:
+            out[excluded_columns, excluded_rows] = 0
+    if same_pool:
+        np.fill_diagonal(out, 0)
+    return out
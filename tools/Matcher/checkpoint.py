@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+
+
+class ScoreCheckpoint:
+    """
+    A score matrix being calculated block by block, kept in a directory so
+    that an interrupted calculate_score_matrix run can be resumed:
+        score_matrix.npy    - the (n, m) float64 matrix, written in place
+                              through a memory map
+        manifest.json       - the key of the run (scorer, config hash, data
+                              fingerprint, chunk size, ...), the row blocks
+                              already written and whether the run finished
+
+    A block is only recorded after its rows are flushed to disk, so every
+    block in the manifest is complete. A run with a different key starts
+    over in the same directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.matrix_path = os.path.join(directory, "score_matrix.npy")
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.key = None
+        self.matrix = None
+        self.completed = set()
+        self.complete = False
+
+    def open(self, key: dict, shape: tuple[int, int]) -> None:
+        """
+        Opens the checkpoint of the run identified by key: resumes it when
+        the manifest matches, otherwise allocates a new matrix.
+        """
+        self.key = key
+        manifest = None
+        if os.path.exists(self.manifest_path) and os.path.exists(self.matrix_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        if manifest is not None and manifest["key"] == key and tuple(manifest["shape"]) == tuple(shape):
+            self.completed = {tuple(block) for block in manifest["completed_blocks"]}
+            self.complete = manifest["complete"]
+            # copy-on-write: a finished matrix can be modified by the caller
+            # without touching the checkpoint
+            self.matrix = np.load(self.matrix_path, mmap_mode="c" if self.complete else "r+")
+            return
+
+        self.completed = set()
+        self.complete = False
+        # invalidate before the old matrix is overwritten
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        self.matrix = np.lib.format.open_memmap(self.matrix_path, mode="w+", dtype=np.float64, shape=shape)
+        self._save_manifest()
+
+    def reset(self) -> None:
+        """Forgets the recorded run, so the next open starts over."""
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+    def mark_done(self, block: tuple[int, int]) -> None:
+        # flushes the file's dirty pages, including those written by workers
+        # through their own mappings
+        self.matrix.flush()
+        self.completed.add(tuple(block))
+        self._save_manifest()
+
+    def mark_complete(self) -> None:
+        self.matrix.flush()
+        self.complete = True
+        self._save_manifest()
+        self.matrix = np.load(self.matrix_path, mmap_mode="c")
+
+    def _save_manifest(self) -> None:
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "key": self.key,
+                    "shape": list(self.matrix.shape),
+                    "completed_blocks": sorted(self.completed),
+                    "complete": self.complete,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.manifest_path)
@@ -3,50 +3,139 @@ import pandas as pd
 from pandas import DataFrame
 import numpy as np
 
+from .embedding_cache import EmbeddingCache
+from .encoders import Encoder
+
 class EmbeddingUtilities:
-    def __init__(self, model: SentenceTransformer):
-        
+    # columns holding a list of short texts / a single free-text answer
+    list_columns = ["hobbies", "fav_movies"]
+    text_columns = ["why_lamp_remembered_your_name", "expectation", "weekend_arrangement", "wish"]
+
+    def __init__(
+        self,
+        model: SentenceTransformer | Encoder,
+        cache: EmbeddingCache | None = None,
+        max_batch_tokens: int = 65536,
+        max_batch_size: int = 1024,
+    ):
+        """
+        Args:
+            model: a SentenceTransformer, or an Encoder backend wrapping one
+                   (e.g. MultiProcessEncoder over encoders.load_cpu_model()).
+            cache: optional on-disk store consulted before the model; only
+                   texts it does not have yet are encoded.
+            max_batch_tokens: padded tokens per batch; texts are sorted by
+                   token length so short texts go in large batches and long
+                   ones in small batches.
+            max_batch_size: upper bound on texts per batch.
+        """
         self.model = model
+        self.cache = cache
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
 
     def transform(self, df: DataFrame) -> DataFrame:
-        df = self._get_embeddings_for_column_list(df, "hobbies")
-        df = self._get_embeddings_for_column_list(df, "fav_movies")
-        df = self._get_embeddings_for_column(df, "why_lamp_remembered_your_name")
-        df = self._get_embeddings_for_column(df, "expectation")
-        df = self._get_embeddings_for_column(df, "weekend_arrangement")
-        df = self._get_embeddings_for_column(df, "wish")
-        return df
-    
-    def _find_unique_texts_from_column(self, df: pd.Series, column: str) -> set[str]:
-        print(f"Finding unique texts from column {column}")
-        all_texts = set()
-        for texts in df[column]:
-            all_texts.update(texts)
-        print(f"Found {len(all_texts)} unique texts")
-        return all_texts
-        
-    def _get_embeddings(self, texts: list[str]) ->np.ndarray:
-        return self.model.encode(texts)
-    
-    def _get_embeddings_for_column_list(self, df: DataFrame, column: str) -> DataFrame:
-        print(f"Getting embeddings for column {column}")
-        all_texts = list(
-            self._find_unique_texts_from_column(df, column)
-        )
-        all_texts_embeddings = self._get_embeddings(all_texts)
-        texts_to_index = {text: index for index, text in enumerate(all_texts)}
-        
-        df[f"{column}_embeddings"] = df[column].map(
-            lambda x: np.array([all_texts_embeddings[texts_to_index[text]] for text in x])
-        )
-        print(f"Saved embeddings to column {f"{column}_embeddings"}")
+        """
+        Embeds every text column in one pass: the distinct texts of all six
+        columns are encoded once, then scattered back to
+        f"{column}_embeddings".
+        """
+        texts = self._find_unique_texts(df)
+        print(f"Found {len(texts)} unique texts in {len(self.list_columns + self.text_columns)} columns")
+        embeddings = self._get_embeddings(texts)
+        texts_to_index = {text: index for index, text in enumerate(texts)}
+
+        for column in self.list_columns:
+            df[f"{column}_embeddings"] = df[column].map(
+                lambda x: np.array([embeddings[texts_to_index[text]] for text in x])
+            )
+            print(f"Saved embeddings to column {f"{column}_embeddings"}")
+        for column in self.text_columns:
+            df[f"{column}_embeddings"] = [
+                np.asarray(embeddings[texts_to_index[text.strip()]]) for text in df[column]
+            ]
+            print(f"Saved embeddings to column {f"{column}_embeddings"}")
         return df
-    
-    def _get_embeddings_for_column(self, df: DataFrame, column: str) -> DataFrame:
-        print(f"Getting embeddings for column {column}")
-        texts = [text.strip() for text in df[column]]
-        texts_embeddings = self._get_embeddings(texts)  # shape (n_rows, embedding_dim)
-        df[f"{column}_embeddings"] = [np.asarray(texts_embeddings[i]) for i in range(len(texts_embeddings))]
-        print(f"Saved embeddings to column {f"{column}_embeddings"}")
+
+    def transform_incremental(self, df: DataFrame, previous: DataFrame | None) -> DataFrame:
+        """
+        transform() for only the applicants that are new or edited since
+        previous, the embedded DataFrame saved by the last run (e.g.
+        DataLoader.load_data). Rows are matched on id; a row is reused when
+        its updated_at is unchanged. Falls back to a full transform when
+        there is no usable previous run.
+        """
+        if previous is None or "updated_at" not in previous.columns:
+            return self.transform(df)
+        embedding_columns = [f"{column}_embeddings" for column in self.list_columns + self.text_columns]
+        previous_updated_at = dict(zip(previous["id"], previous["updated_at"]))
+        changed = [
+            previous_updated_at.get(applicant_id) != updated_at
+            for applicant_id, updated_at in zip(df["id"], df["updated_at"])
+        ]
+        changed_df = df[changed].copy()
+        print(f"{len(changed_df)} new or updated applicants, reusing {len(df) - len(changed_df)}")
+        if len(changed_df):
+            changed_df = self.transform(changed_df)
+
+        df = df.copy()
+        for column in embedding_columns:
+            embeddings = dict(zip(previous["id"], previous[column]))
+            embeddings.update(zip(changed_df["id"], changed_df.get(column, [])))
+            # copies, so the frame never holds views of the memory-mapped
+            # files save_data is about to replace
+            df[column] = [np.array(embeddings[applicant_id]) for applicant_id in df["id"]]
         return df
-    
\ No newline at end of file
+
+    def _find_unique_texts(self, df: DataFrame) -> list[str]:
+        all_texts = {}
+        for column in self.list_columns:
+            for texts in df[column]:
+                all_texts.update(dict.fromkeys(texts))
+        for column in self.text_columns:
+            all_texts.update(dict.fromkeys(text.strip() for text in df[column]))
+        return list(all_texts)
+
+    def _get_embeddings(self, texts: list[str]) ->np.ndarray:
+        if self.cache is not None:
+            return self.cache.encode(texts, self._encode_length_bucketed)
+        return self._encode_length_bucketed(texts)
+
+    def _token_lengths(self, texts: list[str]) -> np.ndarray:
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return np.array([len(text) for text in texts])
+        lengths = np.array([len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]])
+        max_seq_length = getattr(self.model, "max_seq_length", None)
+        return np.minimum(lengths, max_seq_length) if max_seq_length else lengths
+
+    def _encode_length_bucketed(self, texts: list[str]) -> np.ndarray:
+        """
+        Encodes texts shortest first, in batches that fill max_batch_tokens
+        padded tokens (the last text of a batch is its longest).
+        """
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        lengths = self._token_lengths(texts)
+        order = np.argsort(lengths, kind="stable")
+
+        batches, start = [], 0
+        while start < len(order):
+            stop = start + 1
+            while (
+                stop < len(order)
+                and stop - start < self.max_batch_size
+                and (stop - start + 1) * max(lengths[order[stop]], 1) <= self.max_batch_tokens
+            ):
+                stop += 1
+            batches.append(order[start:stop])
+            start = stop
+        print(f"Encoding {len(texts)} texts in {len(batches)} length-bucketed batches")
+
+        embeddings = None
+        for batch in batches:
+            encoded = self.model.encode([texts[i] for i in batch], batch_size=len(batch))
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+            embeddings[batch] = encoded
+        return embeddings
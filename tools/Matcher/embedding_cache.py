@@ -0,0 +1,204 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from contextlib import contextmanager
+from typing import Callable
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding store keyed by (model name, normalized text hash).
+
+    Every model gets its own directory holding:
+        embeddings.<n>.f16  - float16 matrix of shape (rows, dim), memory-mapped
+        index.json          - text key -> [row, last_used], plus the name of
+                              the current matrix file, dim, rows and clock
+
+    New embeddings are appended to the matrix; rows that are no longer
+    indexed (evicted entries, or an interrupted write) are dropped by
+    compact(), which writes a new matrix file and only then switches the
+    index over to it. With max_entries set, the least recently used entries
+    are evicted whenever the store grows past it.
+
+    Several processes may share a store: every write re-reads the index and
+    appends under an exclusive flock on the directory's lock file, so
+    concurrent writers serialize instead of overwriting each other's rows.
+    """
+
+    def __init__(self, model_name: str, path: str = "./embedding_cache/", max_entries: int | None = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.path = os.path.join(path, re.sub(r"[^\w.-]", "_", model_name))
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.index_path = os.path.join(self.path, "index.json")
+        self.lock_path = os.path.join(self.path, "lock")
+
+        self.data_file = "embeddings.0.f16"
+        self.dim = None
+        self.rows = 0
+        self.clock = 0
+        self.entries = {}
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Takes over the index on disk, if any, keeping the later clock."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        self.data_file = index["data_file"]
+        self.dim, self.rows = index["dim"], index["rows"]
+        self.clock = max(self.clock, index["clock"])
+        self.entries = index["entries"]
+
+    @contextmanager
+    def _locked(self):
+        """
+        Exclusive lock over the store, held across re-reading the index,
+        writing and saving it, so another process cannot append rows or
+        compact in between.
+        """
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._load_index()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """NFKC, trimmed, with every run of whitespace collapsed to one space."""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        ).hexdigest()
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.path, self.data_file)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _matrix(self) -> np.ndarray:
+        if not self.rows:
+            return np.zeros((0, self.dim or 0), dtype=np.float16)
+        return np.memmap(self.data_path, dtype=np.float16, mode="r", shape=(self.rows, self.dim))
+
+    def encode(self, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns the (len(texts), dim) float32 embeddings of texts. Only the
+        texts missing from the store are passed to encode (once per distinct
+        normalized text); their embeddings are stored before returning.
+
+        Hits and misses both go through float16, so a text embeds to the
+        same vector whether or not it was cached.
+
+        encode runs without the lock; misses that another process stored in
+        the meantime are not appended twice, and hits it evicted meanwhile
+        are encoded again under the lock.
+        """
+        keys = [self.key(text) for text in texts]
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in self.entries and key not in missing:
+                missing[key] = text
+        new_embeddings = None
+        if missing:
+            print(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+            new_embeddings = np.asarray(encode(list(missing.values())))
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        with self._locked():
+            if new_embeddings is not None:
+                new = [(i, key) for i, key in enumerate(missing) if key not in self.entries]
+                self._append([key for _, key in new], new_embeddings[[i for i, _ in new]])
+            evicted = {}
+            for text, key in zip(texts, keys):
+                if key not in self.entries and key not in evicted:
+                    evicted[key] = text
+            if evicted:
+                self._append(list(evicted), np.asarray(encode(list(evicted.values()))))
+
+            self.clock += 1
+            rows = np.empty(len(keys), dtype=np.intp)
+            for i, key in enumerate(keys):
+                entry = self.entries[key]
+                entry[1] = self.clock
+                rows[i] = entry[0]
+            embeddings = self._matrix()[rows].astype(np.float32)
+            if self.max_entries is not None and len(self.entries) > self.max_entries:
+                self._compact(self.max_entries)
+            else:
+                self._save_index()
+        return embeddings
+
+    def _append(self, keys: list[str], embeddings: np.ndarray) -> None:
+        """Call under _locked()."""
+        if not keys:
+            return
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim {embeddings.shape[1]} does not match the cache ({self.dim})")
+        # rows past self.rows are leftovers of an interrupted write
+        with open(self.data_path, "r+b" if os.path.exists(self.data_path) else "wb") as f:
+            f.truncate(self.rows * self.dim * 2)
+            f.seek(0, os.SEEK_END)
+            f.write(embeddings.astype(np.float16).tobytes())
+        for offset, key in enumerate(keys):
+            self.entries[key] = [self.rows + offset, self.clock]
+        self.rows += len(keys)
+
+    def _save_index(self) -> None:
+        """Call under _locked()."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "data_file": self.data_file,
+                    "dim": self.dim,
+                    "rows": self.rows,
+                    "clock": self.clock,
+                    "entries": self.entries,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def compact(self, max_entries: int | None = None) -> None:
+        """
+        Rewrites the matrix with only the indexed rows. With max_entries, the
+        least recently used entries beyond it are evicted first.
+        """
+        with self._locked():
+            self._compact(max_entries)
+
+    def _compact(self, max_entries: int | None) -> None:
+        keys = sorted(self.entries, key=lambda key: self.entries[key][1], reverse=True)
+        if max_entries is not None:
+            keys = keys[:max_entries]
+        rows = np.array([self.entries[key][0] for key in keys], dtype=np.intp)
+        embeddings = np.asarray(self._matrix()[rows]) if self.rows else np.zeros((0, 0), dtype=np.float16)
+
+        old_path = self.data_path
+        generation = int(self.data_file.split(".")[1]) + 1
+        self.data_file = f"embeddings.{generation}.f16"
+        with open(self.data_path, "wb") as f:
+            f.write(embeddings.tobytes())
+        self.entries = {key: [row, self.entries[key][1]] for row, key in enumerate(keys)}
+        self.rows = len(keys)
+        self._save_index()
+        if os.path.exists(old_path):
+            os.remove(old_path)
+        print(f"Compacted embedding cache to {self.rows} entries")
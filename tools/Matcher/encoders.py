@@ -0,0 +1,110 @@
+import abc
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# Small multilingual model with int8 ONNX exports, for machines without a GPU
+CPU_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# the AVX2 export runs on any x86-64 CPU; the VNNI one is faster where the
+# CPU has AVX512-VNNI, but ONNX Runtime's u8s8 kernels can saturate on it
+# without VNNI, so it is opt-in (file_name=CPU_MODEL_FILE_VNNI)
+CPU_MODEL_FILE = "onnx/model_qint8_avx2.onnx"
+CPU_MODEL_FILE_VNNI = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+class Encoder(abc.ABC):
+    """
+    Encoder backend for EmbeddingUtilities. A SentenceTransformer already
+    has this interface; subclasses wrap one to change how it is run.
+    """
+
+    tokenizer = None
+    max_seq_length: int | None = None
+
+    @abc.abstractmethod
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def get_sentence_embedding_dimension(self) -> int:
+        pass
+
+
+class MultiProcessEncoder(Encoder):
+    """
+    Runs a SentenceTransformer in a pool of CPU worker processes, each
+    encoding a share of every batch.
+    """
+
+    def __init__(self, model: SentenceTransformer, n_processes: int | None = None):
+        self.model = model
+        self.tokenizer = model.tokenizer
+        self.max_seq_length = model.max_seq_length
+        self.pool = model.start_multi_process_pool(["cpu"] * (n_processes or os.cpu_count() or 4))
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        # every worker gets at least one chunk
+        chunk_size = max(1, -(-len(texts) // len(self.pool["processes"])))
+        return self.model.encode_multi_process(
+            texts, self.pool, batch_size=batch_size, chunk_size=chunk_size
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def close(self) -> None:
+        SentenceTransformer.stop_multi_process_pool(self.pool)
+
+
+def load_cpu_model(
+    model_name: str = CPU_MODEL_NAME, file_name: str | None = CPU_MODEL_FILE
+) -> SentenceTransformer:
+    """
+    Loads model_name on the CPU through the ONNX backend, by default its
+    portable int8-quantized export (file_name=None picks the plain ONNX
+    model, CPU_MODEL_FILE_VNNI the export for AVX512-VNNI CPUs).
+    """
+    model_kwargs = {"file_name": file_name} if file_name else {}
+    return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+def _similarities(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings @ embeddings.T
+
+
+def benchmark_encoder(
+    encoder: SentenceTransformer | Encoder,
+    texts: list[str],
+    reference_embeddings: np.ndarray | None = None,
+    batch_size: int = 32,
+) -> dict:
+    """
+    Encodes texts once and reports the throughput. With reference_embeddings
+    (the reference model's embeddings of the same texts, e.g. taken from a
+    previous embedded DataFrame) it also reports the similarity drift: the
+    two models live in different vector spaces, so their pairwise cosine
+    similarity matrices over the sample are compared instead.
+    """
+    start = time.perf_counter()
+    embeddings = encoder.encode(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    report = {
+        "texts": len(texts),
+        "seconds": elapsed,
+        "texts_per_second": len(texts) / elapsed if elapsed > 0 else float("inf"),
+    }
+    if reference_embeddings is not None:
+        upper = np.triu_indices(len(texts), k=1)
+        similarity = _similarities(embeddings)[upper]
+        reference = _similarities(reference_embeddings)[upper]
+        report["mean_abs_similarity_drift"] = float(np.abs(similarity - reference).mean())
+        report["max_abs_similarity_drift"] = float(np.abs(similarity - reference).max())
+        report["similarity_correlation"] = float(np.corrcoef(similarity, reference)[0, 1])
+    print(
+        ", ".join(f"{key}: {value:.4g}" if isinstance(value, float) else f"{key}: {value}" for key, value in report.items())
+    )
+    return report
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from .features import FeatureStore
+
+
+class FeasibilityIndex:
+    """
+    Hard constraints of PreferenceScorer, indexed so that the pairs that are
+    guaranteed to score -inf can be skipped before any scoring happens.
+
+    A from-applicant rules out a to-applicant when the to-applicant's grade
+    is not in preferred_grades, the school is not in preferred_schools, the
+    locations differ under same_location_only, the time difference exceeds
+    max_time_difference, or the from-applicant has continue_match == 0.
+    A preferred_wxid match is always feasible.
+
+    preferred_grades / preferred_schools come from the FeatureStore as one
+    bitset per applicant, so a block of the mask is a couple of shifts and
+    ands.
+    """
+
+    def __init__(
+        self,
+        from_df: pd.DataFrame,
+        to_df: pd.DataFrame,
+        from_features: FeatureStore | None = None,
+        to_features: FeatureStore | None = None,
+    ):
+        """
+        Args:
+            from_df, to_df: pools as returned by MatchingUtilities.prepare_data
+                            (preferred_grades / preferred_schools as lists,
+                            timezone as an hour offset).
+            from_features, to_features: their compiled FeatureStores, built
+                            from the DataFrames when not given.
+        """
+        source = from_features or FeatureStore.from_dataframe(from_df)
+        target = to_features or FeatureStore.from_dataframe(to_df)
+
+        self.shape = (len(source), len(target))
+        self.preferred_grades = source["preferred_grades"]
+        self.preferred_schools = source["preferred_schools"]
+        self.grade = target["grade"].astype(np.uint64)
+        self.school = target["school"].astype(np.uint64)
+        self.from_location = source["location"]
+        self.to_location = target["location"]
+        self.same_location_only = source["same_location_only"]
+        self.continue_match = source["continue_match"]
+        self.from_timezone = source["timezone"]
+        self.to_timezone = target["timezone"]
+        self.max_time_difference = source["max_time_difference"]
+
+        self.preferred_column = source.preferred_columns(target)
+
+    def mask(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """
+        Returns the (stop - start, m) boolean mask of feasible pairs for the
+        from-applicants start..stop.
+        """
+        rows = slice(start, stop)
+        one = np.uint64(1)
+        feasible = (
+            (self.preferred_grades[rows, None] >> self.grade[None, :]) & one
+        ).astype(bool)
+        feasible &= ((self.preferred_schools[rows, None] >> self.school[None, :]) & one).astype(bool)
+        feasible &= ~self.same_location_only[rows, None] | (
+            self.from_location[rows, None] == self.to_location[None, :]
+        )
+        feasible &= self.continue_match[rows, None]
+
+        time_a = self.from_timezone[rows, None]
+        time_b = self.to_timezone[None, :]
+        time_difference = np.minimum((time_a - time_b) % 24, (time_b - time_a) % 24)
+        feasible &= time_difference <= self.max_time_difference[rows, None]
+
+        preferred = self.preferred_column[rows]
+        preferred_rows = np.flatnonzero(preferred >= 0)
+        feasible[preferred_rows, preferred[preferred_rows]] = True
+        return feasible
+
+    def candidate_pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the feasible pairs as (rows, cols) coordinate arrays."""
+        return np.nonzero(self.mask())
+
+    @staticmethod
+    def mutual_mask(
+        from_df: pd.DataFrame,
+        to_df: pd.DataFrame,
+        from_features: FeatureStore | None = None,
+        to_features: FeatureStore | None = None,
+    ) -> np.ndarray:
+        """
+        Pairs feasible in both directions. The final matrix takes the min of
+        both directions, so any other pair ends up -inf there anyway.
+        """
+        from_features = from_features or FeatureStore.from_dataframe(from_df)
+        to_features = to_features or FeatureStore.from_dataframe(to_df)
+        return (
+            FeasibilityIndex(from_df, to_df, from_features, to_features).mask()
+            & FeasibilityIndex(to_df, from_df, to_features, from_features).mask().T
+        )
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Fixed vocabularies, so codes mean the same thing in every pool and a store
+# can be compiled and persisted on its own
+GRADES = ("UG1", "UG2", "UG3", "UG4", "UG5", "MS", "PHD", "GRAD")
+SCHOOLS = ("UST", "HKU", "CUHK")
+# code of a school outside SCHOOLS: no preferred_schools bitset has its bit,
+# so such an applicant never qualifies instead of failing the whole pool
+UNKNOWN_SCHOOL = len(SCHOOLS)
+LOCATIONS = ("HK", "SZ", "GD", "CN", "TW", "JP_KR", "ASIA", "OCEANIA", "UK", "EU", "US", "CA", "NA", "OTHER")
+REPLY_FREQUENCIES = ("1", "2", "3", "4", "5")
+MBTI_LETTERS = ("e", "i", "s", "n", "t", "f", "j", "p", "x")
+MBTI_DIMENSIONS = ("ei", "sn", "tf", "jp")
+
+
+def _codes(
+    values: pd.Series, vocabulary: tuple[str, ...], column: str, unknown: int | None = None
+) -> np.ndarray:
+    """Integer codes over vocabulary; values outside it get unknown, or raise when it is None."""
+    codes = {value: code for code, value in enumerate(vocabulary)}
+    if unknown is not None:
+        return np.array([codes.get(value, unknown) for value in values], dtype=np.int8)
+    try:
+        return np.array([codes[value] for value in values], dtype=np.int8)
+    except KeyError as e:
+        raise ValueError(f"Unknown {column}: {e.args[0]}") from None
+
+
+def _bitsets(lists: pd.Series, vocabulary: tuple[str, ...]) -> np.ndarray:
+    """One uint64 per applicant, bit k set when vocabulary[k] is in the list."""
+    bits = {value: np.uint64(1) << np.uint64(code) for code, value in enumerate(vocabulary)}
+    bitsets = np.zeros(len(lists), dtype=np.uint64)
+    for i, values in enumerate(lists):
+        for value in values:
+            # values outside the vocabulary can never match anyone
+            bitsets[i] |= bits.get(value, np.uint64(0))
+    return bitsets
+
+
+class FeatureStore:
+    """
+    Compiled applicant features of one pool, the input of vectorized scoring
+    (PreferenceScorer, SimilarityScorer, FeasibilityIndex).
+
+    Categorical columns are integer codes over the fixed vocabularies above,
+    preferred_grades / preferred_schools are bitsets over GRADES / SCHOOLS,
+    flags are booleans, and every embedding column is one matrix (ragged
+    columns like hobbies_embeddings as a flat matrix plus offsets). Values
+    that depend on ScorerConfig (grade values, location groups, MBTI signs,
+    reply-frequency rewards) are looked up from the codes by the scorers, so
+    one store serves any config.
+
+    Build it once per pool with from_dataframe (or DataLoader.save_data,
+    which persists it next to the embeddings) and hand it to every scorer.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], embeddings: dict[str, tuple[np.ndarray, np.ndarray | None]]):
+        self.arrays = arrays
+        self.embeddings = embeddings
+
+    def __len__(self) -> int:
+        return len(self.arrays["grade"])
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "FeatureStore":
+        """
+        Compiles a pool as returned by MatchingUtilities.prepare_data, plus
+        any embedding columns EmbeddingUtilities added.
+        """
+        arrays = {
+            "grade": _codes(df["grade"], GRADES, "grade"),
+            "school": _codes(df["school"], SCHOOLS, "school", unknown=UNKNOWN_SCHOOL),
+            "location": _codes(df["location"], LOCATIONS, "location"),
+            "reply_frequency": _codes(df["reply_frequency"], REPLY_FREQUENCIES, "reply_frequency"),
+            "preferred_grades": _bitsets(df["preferred_grades"], GRADES),
+            "preferred_schools": _bitsets(df["preferred_schools"], SCHOOLS),
+            "timezone": df["timezone"].to_numpy(),
+            "max_time_difference": df["max_time_difference"].to_numpy(),
+            "same_location_only": df["same_location_only"].to_numpy() == 1,
+            "continue_match": df["continue_match"].to_numpy() != 0,
+            "wxid": np.array([str(wxid) for wxid in df["wxid"]]),
+            "preferred_wxid": np.array(
+                # NaN never equals a wxid
+                [wxid if isinstance(wxid, str) else "" for wxid in df["preferred_wxid"]]
+            ),
+        }
+        for dim in MBTI_DIMENSIONS:
+            arrays[f"mbti_{dim}"] = df[f"mbti_{dim}"].to_numpy()
+            arrays[f"preferred_mbti_{dim}"] = _codes(df[f"preferred_mbti_{dim}"], MBTI_LETTERS, f"preferred_mbti_{dim}")
+
+        embeddings = {}
+        for column in df.columns:
+            if not column.endswith("_embeddings") or not len(df):
+                continue
+            values = list(df[column])
+            if np.ndim(values[0]) == 2:
+                lengths = [len(value) for value in values]
+                offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+                embeddings[column] = (np.concatenate(values), offsets)
+            else:
+                embeddings[column] = (np.stack(values), None)
+        return cls(arrays, embeddings)
+
+    def preferred_columns(self, target: "FeatureStore") -> np.ndarray:
+        """preferred_wxid -> row index in target (wxid is unique), -1 when not in target."""
+        wxid_rows = {wxid: j for j, wxid in enumerate(target["wxid"])}
+        return np.array(
+            [wxid_rows.get(wxid, -1) if wxid else -1 for wxid in self["preferred_wxid"]],
+            dtype=np.intp,
+        )
+
+    def embedding_sets(self, column: str) -> tuple[np.ndarray, np.ndarray]:
+        """(flat matrix, offsets) of a ragged embedding column."""
+        matrix, offsets = self.embeddings[column]
+        if offsets is None:
+            raise ValueError(f"{column} is not a list-valued embedding column")
+        return matrix, offsets
+
+    def embedding_matrix(self, column: str) -> np.ndarray:
+        matrix, offsets = self.embeddings[column]
+        if offsets is not None:
+            raise ValueError(f"{column} is a list-valued embedding column")
+        return matrix
+
+    def fingerprint(self) -> str:
+        """sha256 over every array and embedding matrix of the store."""
+        digest = hashlib.sha256()
+        items = dict(self.arrays)
+        for column, (matrix, offsets) in self.embeddings.items():
+            items[column] = matrix
+            if offsets is not None:
+                items[f"{column}.offsets"] = offsets
+        for key, array in sorted(items.items(), key=lambda item: item[0]):
+            array = np.ascontiguousarray(array)
+            digest.update(f"{key}:{array.dtype.str}:{array.shape}".encode("utf-8"))
+            digest.update(memoryview(array).cast("B"))
+        return digest.hexdigest()
+
+    def save(self, directory: str, embeddings: bool = True) -> None:
+        """
+        Writes features.npz and features.json to directory, and the
+        embeddings as <column>.npy (+ <column>.offsets.npy), the layout
+        DataLoader uses. embeddings=False skips the matrices when they are
+        already there.
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        np.savez(os.path.join(directory, "features.npz"), **self.arrays)
+        if embeddings:
+            for column, (matrix, offsets) in self.embeddings.items():
+                np.save(os.path.join(directory, f"{column}.npy"), matrix)
+                if offsets is not None:
+                    np.save(os.path.join(directory, f"{column}.offsets.npy"), offsets)
+        with open(os.path.join(directory, "features.json"), "w", encoding="utf-8") as f:
+            json.dump({"embedding_columns": list(self.embeddings)}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "FeatureStore":
+        """Loads a saved store; the embedding matrices are memory-mapped."""
+        with np.load(os.path.join(directory, "features.npz")) as data:
+            arrays = dict(data)
+        with open(os.path.join(directory, "features.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        embeddings = {}
+        for column in manifest["embedding_columns"]:
+            matrix = np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+            offsets_path = os.path.join(directory, f"{column}.offsets.npy")
+            offsets = np.load(offsets_path) if os.path.exists(offsets_path) else None
+            embeddings[column] = (matrix, offsets)
+        return cls(arrays, embeddings)
@@ -1,12 +1,23 @@
 import numpy as np
+from typing import Literal
 from munkres import Munkres
 import networkx as nx
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
 
 
 class Matcher:
-    def __init__(self, m: np.ndarray):
-        self.m = m
+    def __init__(self, m: np.ndarray | sparse.spmatrix):
+        """
+        Args:
+            m: score matrix, either dense or a scipy sparse matrix whose stored
+               entries are the scores (absent pairs score 0, i.e. are never
+               worth matching), e.g. from aggregate_scores.
+        """
+        self.m = sparse.csr_matrix(m) if sparse.issparse(m) else m
         self.munkers = Munkres()
+        self.stats = {}
 
     def prepareMatrix(self) -> np.ndarray:
         if self.m.shape[0] == self.m.shape[1]:
@@ -15,28 +26,443 @@ class Matcher:
         padded[:self.m.shape[0], :self.m.shape[1]] = self.m
         self.m = padded
         return self.m
-    
+
     def calculate_cost_matrix(self) -> np.ndarray:
         return np.max(self.m) - self.m
 
-    def hungarian(self) -> list[tuple[int, int]]:
+    def hungarian(
+        self, solver: Literal["scipy", "munkres"] = "scipy"
+    ) -> list[tuple[int, int]]:
+        """
+        Max-score assignment. Returns a permutation of the max(n, m) padded
+        square: pairs with an index past the real rows / columns, or with a
+        score <= 0, are unmatched.
+
+        Args:
+            solver: "scipy" (the default) solves the rectangular float matrix
+                    with scipy's linear_sum_assignment and maximizes the sum
+                    of the positive scores only: negative and -inf pairs are
+                    never assigned, and scores are not truncated to ints.
+                    "munkres" is the original pure-Python path, which pads to
+                    an int matrix and completes the assignment even through
+                    negative pairs, so on ties or negative scores its pairs
+                    can differ.
+        """
+        if sparse.issparse(self.m):
+            return self._hungarian_sparse()
+        if solver == "scipy":
+            return self._hungarian_scipy()
+        if solver != "munkres":
+            raise ValueError(f"Unknown solver: {solver}")
         self.prepareMatrix()
         cost = self.calculate_cost_matrix()
         indexes = self.munkers.compute(cost)
         return indexes
 
-    def max_weight_matching_same_group(self) -> list[tuple[int, int]]:
+    @staticmethod
+    def _pad_assignment(
+        pairs: list[tuple[int, int]], size: int
+    ) -> list[tuple[int, int]]:
+        """Pairs the rows and columns left out of pairs with each other."""
+        matched_rows = {i for i, _ in pairs}
+        matched_cols = {j for _, j in pairs}
+        free_rows = [i for i in range(size) if i not in matched_rows]
+        free_cols = [j for j in range(size) if j not in matched_cols]
+        return sorted(pairs + list(zip(free_rows, free_cols)))
+
+    def _hungarian_scipy(self) -> list[tuple[int, int]]:
+        n, m = self.m.shape
+        scores = np.asarray(self.m, dtype=np.float64)
+        # a pair scoring <= 0 (or -inf) is worth as much as leaving both
+        # unmatched, so a full assignment of the clipped matrix maximizes the
+        # sum of positive scores and its 0 pairs are dropped
+        gains = np.where(scores > 0, scores, 0.0)
+        rows, cols = linear_sum_assignment(gains, maximize=True)
+        positive = gains[rows, cols] > 0
+        pairs = list(zip(rows[positive].tolist(), cols[positive].tolist()))
+        return self._pad_assignment(pairs, max(n, m))
+
+    def _hungarian_sparse(self) -> list[tuple[int, int]]:
+        """
+        hungarian() on the sparse edge list. Returns the same shape of
+        result as the dense path.
+        """
+        n, m = self.m.shape
+        scores = self.m.tocoo()
+        positive = scores.data > 0
+        pairs = self._assign_edges(
+            n, m, scores.row[positive], scores.col[positive], scores.data[positive]
+        )
+        return self._pad_assignment(pairs, max(n, m))
+
+    @staticmethod
+    def _assign_edges(
+        n: int, m: int, rows: np.ndarray, cols: np.ndarray, data: np.ndarray
+    ) -> list[tuple[int, int]]:
+        """
+        Max-score assignment over the positive edges (rows, cols, data) of an
+        (n, m) matrix. Every row gets a private dummy column costing as much
+        as a 0-score edge, so a full matching always exists and only
+        positive-score edges are worth taking. Returns the matched edges.
+        """
+        if not len(data):
+            return []
+        # costs must stay strictly positive, stored zeros are not edges
+        ceiling = data.max() + 1
+        cost = sparse.csr_matrix(
+            (
+                np.concatenate([ceiling - data, np.full(n, ceiling)]),
+                (np.concatenate([rows, np.arange(n)]), np.concatenate([cols, m + np.arange(n)])),
+            ),
+            shape=(n, m + n),
+        )
+        _, matched_cols = min_weight_full_bipartite_matching(cost)
+        return [(i, int(j)) for i, j in enumerate(matched_cols) if j < m]
+
+    def _top_k_edges(
+        self, row_k: np.ndarray, col_k: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Positive edges (rows, cols, data) that are among the top row_k[i] of
+        their row i or the top col_k[j] of their column j.
+        """
+        n, m = self.m.shape
+        if sparse.issparse(self.m):
+            scores = self.m.tocoo()
+            positive = scores.data > 0
+            rows, cols, data = scores.row[positive], scores.col[positive], scores.data[positive]
+            keep = np.zeros(len(data), dtype=bool)
+            for nodes, node_k in ((rows, row_k), (cols, col_k)):
+                order = np.lexsort((-data, nodes))
+                sorted_nodes = nodes[order]
+                group_start = np.flatnonzero(np.r_[True, sorted_nodes[1:] != sorted_nodes[:-1]])
+                rank = np.arange(len(order)) - np.repeat(
+                    group_start, np.diff(np.r_[group_start, len(order)])
+                )
+                keep[order[rank < node_k[sorted_nodes]]] = True
+            return rows[keep], cols[keep], data[keep]
+
+        scores = np.asarray(self.m, dtype=np.float64)
+        candidates = np.zeros((n, m), dtype=bool)
+        # rows (then columns) sharing a k are partitioned together; k only
+        # takes a few distinct values, as it is doubled from a common start
+        for k in np.unique(row_k):
+            selected = np.flatnonzero(row_k == k)
+            if k < m:
+                top = np.argpartition(-scores[selected], k - 1, axis=1)[:, :k]
+                candidates[selected[:, None], top] = True
+            else:
+                candidates[selected] = True
+        for k in np.unique(col_k):
+            selected = np.flatnonzero(col_k == k)
+            if k < n:
+                top = np.argpartition(-scores[:, selected], k - 1, axis=0)[:k]
+                candidates[top, selected[None, :]] = True
+            else:
+                candidates[:, selected] = True
+        rows, cols = np.nonzero(candidates & (scores > 0))
+        return rows, cols, scores[rows, cols]
+
+    @staticmethod
+    def _row_max(
+        scores: np.ndarray | sparse.csr_matrix, v: np.ndarray, chunk_size: int = 1024
+    ) -> np.ndarray:
+        """
+        Per row, max_j (scores[i, j] - v[j]) over positive entries only
+        (-inf for rows without any). A sparse scores must only store
+        positive entries.
+        """
+        n, _ = scores.shape
+        best = np.full(n, -np.inf)
+        if sparse.issparse(scores):
+            filled = np.flatnonzero(np.diff(scores.indptr))
+            if len(filled):
+                reduced = scores.data - v[scores.indices]
+                best[filled] = np.maximum.reduceat(reduced, scores.indptr[filled])
+            return best
+
+        for start in range(0, n, chunk_size):
+            block = np.asarray(scores[start : start + chunk_size], dtype=np.float64)
+            best[start : start + chunk_size] = np.where(block > 0, block - v, -np.inf).max(axis=1)
+        return best
+
+    @staticmethod
+    def _assignment_duals(
+        n: int,
+        m: int,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        data: np.ndarray,
+        pairs: list[tuple[int, int]],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Optimal duals (u, v) of the max-score assignment LP over the edges
+        (rows, cols, data), given its optimal matching pairs: u, v >= 0,
+        u[i] + v[j] >= data for every edge, with equality on the matched
+        ones, so sum(u) + sum(v) is the matched weight.
+
+        They are shortest-path distances from a free node z in the residual
+        graph (z -> unmatched row, row -> column at -score for unmatched
+        edges, column -> row at +score for matched ones, matched column
+        -> z, z -> matched column, unmatched column -> z), found by
+        Bellman-Ford; u[i] = d[i] - d[z] and v[j] = max(0, d[z] - d[j]).
+        """
+        z = n + m
+        matched = np.zeros(len(data), dtype=bool)
+        row_mate = np.full(n, -1, dtype=np.intp)
+        col_mate = np.full(m, -1, dtype=np.intp)
+        if pairs:
+            pair_rows, pair_cols = map(np.array, zip(*pairs))
+            row_mate[pair_rows], col_mate[pair_cols] = pair_cols, pair_rows
+            matched = row_mate[rows] == cols
+        free_rows = np.flatnonzero(row_mate < 0)
+        matched_cols = np.flatnonzero(col_mate >= 0)
+        free_cols = np.flatnonzero(col_mate < 0)
+        source = np.concatenate([
+            np.full(len(free_rows), z),
+            rows[~matched],
+            n + cols[matched],
+            np.full(len(matched_cols), z),
+            n + free_cols,
+        ])
+        target = np.concatenate([
+            free_rows,
+            n + cols[~matched],
+            rows[matched],
+            n + matched_cols,
+            np.full(len(free_cols), z),
+        ])
+        cost = np.concatenate([
+            np.zeros(len(free_rows)),
+            -data[~matched],
+            data[matched],
+            np.zeros(len(matched_cols) + len(free_cols)),
+        ])
+
+        d = np.full(z + 1, np.inf)
+        d[z] = 0
+        tolerance = 1e-12 * max(1.0, float(np.abs(data).max(initial=0)))
+        for _ in range(z + 1):
+            candidate = np.full(z + 1, np.inf)
+            np.minimum.at(candidate, target, d[source] + cost)
+            improved = candidate < d - tolerance
+            if not improved.any():
+                break
+            d[improved] = candidate[improved]
+        # a column without edges is unreachable and free, i.e. v = 0
+        d[~np.isfinite(d)] = 0
+        return d[:n] - d[z], np.maximum(d[z] - d[n:z], 0)
+
+    def hungarian_top_k(
+        self, k: int = 10, max_gap: float = 1e-3, max_k: int | None = None
+    ) -> list[tuple[int, int]]:
+        """
+        hungarian() on a reduced graph: only edges among the top k of their
+        row or column are kept and solved as a sparse assignment.
+
+        The result is certified with the exact duals (u, v) of the reduced
+        assignment (see _assignment_duals): if no pruned edge has
+        m[i, j] > u[i] + v[j], the duals are feasible for the full matrix
+        and the assignment is optimal. Otherwise only the rows and columns
+        of the violating edges get their k doubled (up to max_k, by default
+        the larger side) and the assignment is solved again, until the
+        relative gap to the upper bound sum(v) + sum_i max(u[i],
+        max_j m[i, j] - v[j]) is at most max_gap.
+
+        Returns the same shape of result as hungarian(); self.stats holds
+        the largest k, the rounds, edge count, matched weight, upper bound
+        and gap.
+        """
+        n, m = self.m.shape
+        max_k = max_k or max(n, m)
+        row_k = np.full(n, min(k, max_k))
+        col_k = np.full(m, min(k, max_k))
+        scores = self.m
+        if sparse.issparse(scores):
+            scores = sparse.csr_matrix(scores.multiply(scores > 0))
+            scores.sort_indices()
+        columns = scores.T.tocsr() if sparse.issparse(scores) else scores.T
+        scale = float(scores.max()) if n and m else 0.0
+        tolerance = 1e-9 * max(1.0, scale)
+
+        rounds = 0
+        while True:
+            rounds += 1
+            rows, cols, data = self._top_k_edges(row_k, col_k)
+            pairs = self._assign_edges(n, m, rows, cols, data)
+            weight = float(sum(self.m[i, j] for i, j in pairs))
+            u, v = self._assignment_duals(n, m, rows, cols, data, pairs)
+            # edges of the reduced graph are covered, so these only exceed
+            # the duals through pruned edges
+            row_violation = self._row_max(scores, v) - u
+            col_violation = self._row_max(columns, u) - v
+            upper_bound = float(v.sum() + np.maximum(u, u + row_violation).sum())
+            gap = (upper_bound - weight) / upper_bound if upper_bound > 0 else 0.0
+            self.stats = {
+                "k": int(max(row_k.max(initial=0), col_k.max(initial=0))),
+                "rounds": rounds,
+                "edges": len(data),
+                "weight": weight,
+                "upper_bound": upper_bound,
+                "gap": gap,
+            }
+            widen_rows = (row_violation > tolerance) & (row_k < max_k)
+            widen_cols = (col_violation > tolerance) & (col_k < max_k)
+            if gap <= max_gap or not (widen_rows.any() or widen_cols.any()):
+                return self._pad_assignment(pairs, max(n, m))
+            row_k[widen_rows] = np.minimum(2 * row_k[widen_rows], max_k)
+            col_k[widen_cols] = np.minimum(2 * col_k[widen_cols], max_k)
+
+    def _same_group_edges(
+        self, top_k: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Positive-score edges (i, j, weight) with i < j, taken from the upper
+        triangle. With top_k, an edge is kept only if it is among the top_k
+        edges of at least one of its endpoints.
+        """
+        if sparse.issparse(self.m):
+            upper = sparse.triu(self.m, k=1).tocoo()
+            rows, cols, weights = upper.row, upper.col, upper.data
+            positive = weights > 0
+            rows, cols, weights = rows[positive], cols[positive], weights[positive]
+        else:
+            rows, cols = np.nonzero(np.triu(self.m, k=1) > 0)
+            weights = np.asarray(self.m[rows, cols], dtype=np.float64)
+
+        if top_k is not None and len(weights):
+            # rank every edge within both of its endpoints, heaviest first
+            nodes = np.concatenate([rows, cols])
+            edges = np.tile(np.arange(len(weights)), 2)
+            order = np.lexsort((-np.tile(weights, 2), nodes))
+            nodes, edges = nodes[order], edges[order]
+            group_start = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+            rank = np.arange(len(nodes)) - np.repeat(
+                group_start, np.diff(np.r_[group_start, len(nodes)])
+            )
+            keep = np.zeros(len(weights), dtype=bool)
+            keep[edges[rank < top_k]] = True
+            rows, cols, weights = rows[keep], cols[keep], weights[keep]
+        return rows, cols, weights
+
+    @staticmethod
+    def _greedy_matching(
+        n: int, rows: np.ndarray, cols: np.ndarray, weights: np.ndarray, max_passes: int
+    ) -> np.ndarray:
+        """
+        Greedy matching (heaviest edge first), then local augmentation: an
+        edge (u, v) replaces the edges currently at u and v whenever it
+        outweighs them, until a pass makes no change. Returns mate per node
+        (-1 when unmatched).
+        """
+        order = np.argsort(-weights, kind="stable")
+        edges = list(zip(rows[order].tolist(), cols[order].tolist(), weights[order].tolist()))
+        mate = [-1] * n
+        mate_weight = [0.0] * n
+        for u, v, w in edges:
+            if mate[u] == -1 and mate[v] == -1:
+                mate[u], mate[v] = v, u
+                mate_weight[u] = mate_weight[v] = w
+
+        for _ in range(max_passes):
+            changed = False
+            for u, v, w in edges:
+                if mate[u] == v or w <= mate_weight[u] + mate_weight[v] + 1e-9:
+                    continue
+                for x in (u, v):
+                    if mate[x] != -1:
+                        mate[mate[x]], mate_weight[mate[x]] = -1, 0.0
+                mate[u], mate[v] = v, u
+                mate_weight[u] = mate_weight[v] = w
+                changed = True
+            if not changed:
+                break
+        return np.array(mate, dtype=np.intp)
+
+    @staticmethod
+    def _matching_upper_bound(
+        n: int, rows: np.ndarray, cols: np.ndarray, weights: np.ndarray, max_passes: int = 5
+    ) -> float:
+        """
+        Objective of a feasible dual y (y[i] + y[j] >= weight of every edge,
+        y >= 0), which bounds the max-weight matching from above. Starts
+        from half the heaviest edge at every node, then lowers each y[i] to
+        the least value that still covers its edges.
+        """
+        adjacency = sparse.csr_matrix(
+            (np.concatenate([weights, weights]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(n, n),
+        )
+        y = np.zeros(n)
+        np.maximum.at(y, rows, weights)
+        np.maximum.at(y, cols, weights)
+        y /= 2
+        for _ in range(max_passes):
+            previous = y.sum()
+            for i in range(n):
+                start, stop = adjacency.indptr[i], adjacency.indptr[i + 1]
+                if start < stop:
+                    neighbours = adjacency.indices[start:stop]
+                    y[i] = max(0.0, (adjacency.data[start:stop] - y[neighbours]).max())
+            if y.sum() >= previous:
+                break
+        return y.sum()
+
+    def max_weight_matching_same_group(
+        self,
+        method: Literal["blossom", "greedy"] = "blossom",
+        top_k: int | None = None,
+        max_passes: int = 10,
+    ) -> list[tuple[int, int]]:
         """
         Same-group pairing: maximize sum of scores over disjoint pairs (no cycles).
         Use this instead of hungarian() for FF/MM so the result is always a matching.
         Input matrix should be n×n symmetric; returns [(i, j), ...] with i < j.
+
+        Args:
+            method: "blossom" is the exact networkx max_weight_matching, in
+                    pure Python and O(n^3) (about 15 s at n=600);
+                    "greedy" is greedy + local augmentation, much faster on
+                    large pools but approximate.
+            top_k: only keep each applicant's top_k edges before solving.
+            max_passes: augmentation passes of the greedy method.
+
+        Afterwards self.stats holds the edge count, the matched weight, an
+        upper bound on the optimum over all edges and the relative gap
+        between the two. Exact blossom over all edges is optimal by
+        construction, so its bound is the matched weight and its gap 0.0;
+        otherwise the bound is the dual of _matching_upper_bound, which
+        may itself be loose, so the gap overstates the true optimality gap.
         """
         n, _ = self.m.shape
-        G = nx.Graph()
-        for i in range(n):
-            for j in range(i + 1, n):
-                w = float(self.m[i, j])
-                if w > 0:
-                    G.add_edge(i, j, weight=w)
-        raw = nx.max_weight_matching(G, maxcardinality=False, weight="weight")
-        return [tuple(sorted(e)) for e in raw]
\ No newline at end of file
+        rows, cols, weights = self._same_group_edges(top_k)
+
+        if method == "blossom":
+            G = nx.Graph()
+            G.add_weighted_edges_from(
+                zip(rows.tolist(), cols.tolist(), weights.tolist()), weight="weight"
+            )
+            raw = nx.max_weight_matching(G, maxcardinality=False, weight="weight")
+            pairs = [tuple(sorted(e)) for e in raw]
+        elif method == "greedy":
+            mate = self._greedy_matching(n, rows, cols, weights, max_passes)
+            pairs = [(i, int(j)) for i, j in enumerate(mate) if i < j]
+        else:
+            raise ValueError(f"Unknown method: {method}")
+
+        solved_edges = len(weights)
+        weight = float(sum(self.m[i, j] for i, j in pairs))
+        if method == "blossom" and top_k is None:
+            upper_bound = weight
+        else:
+            if top_k is not None:
+                rows, cols, weights = self._same_group_edges()
+            upper_bound = self._matching_upper_bound(n, rows, cols, weights)
+        self.stats = {
+            "method": method,
+            "edges": solved_edges,
+            "weight": weight,
+            "upper_bound": float(upper_bound),
+            "gap": float((upper_bound - weight) / upper_bound) if upper_bound > 0 else 0.0,
+        }
+        return pairs
@@ -0,0 +1,157 @@
+import heapq
+import sqlite3
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+MATCH_NAME = "取个组名吧!"
+# mentors without an entry in mentor_max
+DEFAULT_MENTOR_MAX = 999
+
+
+def load_mentor_loads(connection: sqlite3.Connection, group_id: int = 1) -> dict[str, int]:
+    """
+    Current number of non-discarded matches of every mentor in group_id,
+    as in 04_07_write_match_to_db (mentors without a match count 0).
+    """
+    rows = connection.execute(
+        "SELECT mentor.id, COUNT(match.id) FROM mentor"
+        " JOIN mentor_groups ON mentor_groups.mentor_id = mentor.id"
+        " LEFT JOIN match ON match.mentor_id = mentor.id AND match.discarded = 0"
+        " WHERE mentor_groups.group_id = ?"
+        " GROUP BY mentor.id ORDER BY mentor.created_at",
+        (group_id,),
+    ).fetchall()
+    return dict(rows)
+
+
+def _claimed_by(mentor_claims: dict[str, list]) -> dict:
+    """applicant id -> (claim order, mentor id) of the first mentor claiming them."""
+    claimed_by = {}
+    for order, (mentor_id, applicant_ids) in enumerate(mentor_claims.items()):
+        for applicant_id in applicant_ids:
+            claimed_by.setdefault(applicant_id, (order, mentor_id))
+    return claimed_by
+
+
+def assign_mentors(
+    matches: pd.DataFrame,
+    mentor_loads: dict[str, int],
+    mentor_claims: dict[str, list] | None = None,
+    mentor_max: dict[str, int] | None = None,
+    schools: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Gives every match (applicant1_id, applicant2_id) a mentor: a match with
+    an applicant in mentor_claims goes to the mentor claiming them (the
+    first one in mentor_claims when both applicants are claimed), every
+    other match to the mentor with the fewest matches among those still
+    under their mentor_max, earlier mentors in mentor_loads first on ties,
+    as in 04_07_write_match_to_db. Matches left over when every mentor is
+    full are not assigned.
+
+    The mentors are kept in min-heaps keyed on (load, ...), so each match
+    costs O(log mentors) instead of a scan over all of them.
+
+    Args:
+        mentor_loads: mentor id -> current match count (load_mentor_loads);
+                      only these mentors get unclaimed matches.
+        mentor_claims: mentor id -> applicant ids the mentor asked for.
+                      Claims are honored even past mentor_max.
+        mentor_max: mentor id -> maximum match count.
+        schools: applicant id -> school. When given, ties in load go to the
+                      mentor with the fewest applicants from the match's
+                      schools, so every mentor gets a similar mix.
+    Returns:
+        applicant1_id, applicant2_id, mentor_id of the assigned matches, in
+        the order of matches.
+    """
+    mentor_max = mentor_max or {}
+    claimed_by = _claimed_by(mentor_claims or {})
+    loads = dict(mentor_loads)
+
+    pairs = list(zip(matches["applicant1_id"], matches["applicant2_id"]))
+    assigned = [None] * len(pairs)
+    school_counts = {mentor_id: {} for mentor_id in mentor_loads}
+    # priority matches
+    for i, (id1, id2) in enumerate(pairs):
+        claims = [claimed_by[applicant_id] for applicant_id in (id1, id2) if applicant_id in claimed_by]
+        if claims:
+            mentor_id = min(claims)[1]
+            assigned[i] = mentor_id
+            loads[mentor_id] = loads.get(mentor_id, 0) + 1
+            _count_schools(school_counts.setdefault(mentor_id, {}), schools, id1, id2)
+
+    order = {mentor_id: position for position, mentor_id in enumerate(mentor_loads)}
+
+    def under_max(mentor_id: str) -> bool:
+        return loads[mentor_id] < mentor_max.get(mentor_id, DEFAULT_MENTOR_MAX)
+
+    def key(mentor_id: str, match_schools: tuple) -> tuple:
+        counts = school_counts[mentor_id]
+        balance = sum(counts.get(school, 0) for school in match_schools)
+        return (loads[mentor_id], balance, order[mentor_id], mentor_id)
+
+    # one heap per combination of schools (a single one without schools);
+    # keys only grow, so an entry whose key is out of date is re-pushed when
+    # it surfaces instead of being updated in every heap
+    heaps = {}
+    for i, (id1, id2) in enumerate(pairs):
+        if assigned[i] is not None:
+            continue
+        match_schools = tuple(sorted({schools[id1], schools[id2]})) if schools is not None else ()
+        heap = heaps.get(match_schools)
+        if heap is None:
+            heap = [key(mentor_id, match_schools) for mentor_id in mentor_loads if under_max(mentor_id)]
+            heapq.heapify(heap)
+            heaps[match_schools] = heap
+        while heap:
+            entry = heapq.heappop(heap)
+            mentor_id = entry[-1]
+            if not under_max(mentor_id):
+                continue
+            current = key(mentor_id, match_schools)
+            if entry != current:
+                heapq.heappush(heap, current)
+                continue
+            assigned[i] = mentor_id
+            loads[mentor_id] += 1
+            _count_schools(school_counts[mentor_id], schools, id1, id2)
+            if under_max(mentor_id):
+                heapq.heappush(heap, key(mentor_id, match_schools))
+            break
+
+    return pd.DataFrame(
+        [(id1, id2, mentor_id) for (id1, id2), mentor_id in zip(pairs, assigned) if mentor_id is not None],
+        columns=["applicant1_id", "applicant2_id", "mentor_id"],
+    )
+
+
+def _count_schools(counts: dict, schools: dict | None, *applicant_ids) -> None:
+    if schools is None:
+        return
+    for applicant_id in applicant_ids:
+        counts[schools[applicant_id]] = counts.get(schools[applicant_id], 0) + 1
+
+
+def new_matches_frame(assignments: pd.DataFrame, round_number: int, now: datetime | None = None) -> pd.DataFrame:
+    """
+    Rows of the match table for assign_mentors' output, with the defaults
+    04_07_write_match_to_db writes.
+    """
+    now = (now or datetime.now(ZoneInfo("Asia/Shanghai"))).strftime("%Y-%m-%d %H:%M:%S")
+    new_matches_df = assignments[["applicant1_id", "applicant2_id", "mentor_id"]].copy()
+    new_matches_df["name"] = MATCH_NAME
+    new_matches_df["round"] = round_number
+
+    default_applicant_status = "P" if round_number == 1 else "A"
+    new_matches_df["applicant1_status"] = default_applicant_status
+    new_matches_df["applicant2_status"] = default_applicant_status
+
+    new_matches_df["discarded"] = False
+    new_matches_df["discard_reason"] = None
+
+    new_matches_df["created_at"] = now
+    new_matches_df["updated_at"] = now
+    return new_matches_df
@@ -0,0 +1,48 @@
+import json
+import os
+
+import numpy as np
+
+
+class PairFeatures:
+    """
+    Config-independent raw features of every (from, to) pair of a scorer,
+    e.g. time differences, location / grade code pairs, per-column cosine
+    similarities. Scorer.rescore combines them under a ScorerConfig, which
+    only takes a few element-wise passes instead of a full scoring run.
+
+    Arrays are keyed by name; their layout is up to the scorer that
+    computed them (see PreferenceScorer / SimilarityScorer
+    _compute_pair_features). Saved as one .npy per array plus
+    pair_features.json; load memory-maps them, so worker processes opening
+    the same directory share the pages.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def save(self, directory: str) -> None:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        files = {}
+        for index, (key, array) in enumerate(self.arrays.items()):
+            # keys contain ":", which is not a safe file name everywhere
+            files[key] = f"{index}.npy"
+            np.save(os.path.join(directory, files[key]), array)
+        with open(os.path.join(directory, "pair_features.json"), "w", encoding="utf-8") as f:
+            json.dump({"files": files}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "PairFeatures":
+        with open(os.path.join(directory, "pair_features.json"), encoding="utf-8") as f:
+            files = json.load(f)["files"]
+        return cls(
+            {key: np.load(os.path.join(directory, file), mmap_mode="r") for key, file in files.items()}
+        )
@@ -0,0 +1,597 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import aggregate_scores_blocked
+from .checkpoint import ScoreCheckpoint
+from .features import FeatureStore
+from .mentors import assign_mentors, load_mentor_loads, new_matches_frame
+from .scorer import ScorerConfig
+from .sweep import AGGREGATION_DEFAULTS, MATRICES, POOLS, SCORERS, _match_pairs
+from .utilities import DataLoader, MatchingUtilities
+
+STAGES = ("extract", "embed", "features", "score", "exclude", "aggregate", "match", "assign", "write")
+MODEL_NAME = "Qwen/Qwen3-Embedding-8B"
+# subtracted from everyone's total towards an applicant who did not respond
+# last round (06_matching-round2)
+NO_RESPONSE_PENALTY = 150
+# final matrix -> (score matrices aggregated into it, rows pool, columns pool),
+# in the order 03_matching-round1 writes the pairs
+GROUPS = {
+    "FM": (("FM", "MF"), "heterosexual_female", "heterosexual_male"),
+    "MM": (("MM",), "homosexual_male", "homosexual_male"),
+    "FF": (("FF",), "homosexual_female", "homosexual_female"),
+}
+
+
+def _key(*parts) -> str:
+    """sha256 of JSON-serializable parts, the cache key of a stage item."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _frame_fingerprint(df: pd.DataFrame) -> str:
+    digest = hashlib.sha256(json.dumps(list(df.columns)).encode("utf-8"))
+    # list columns are not hashable, their repr is
+    digest.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _load_model(model_name: str, cpu: bool):
+    # imported here so that the stages after embed run without torch
+    if cpu:
+        from .encoders import MultiProcessEncoder, load_cpu_model
+
+        return MultiProcessEncoder(load_cpu_model(model_name))
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(
+        model_name,
+        model_kwargs={"dtype": torch.float16, "attn_implementation": "flash_attention_2"},
+        tokenizer_kwargs={"padding_side": "left"},
+        device="cuda",
+    )
+
+
+def _features_job(embed_dir: str, pool: str) -> None:
+    df = DataLoader(embed_dir).load_data(pool)
+    FeatureStore.from_dataframe(df).save(os.path.join(embed_dir, pool), embeddings=False)
+
+
+def _score_job(embed_dir: str, matrix: str, kind: str, config_params: dict, checkpoint: str, n_workers: int) -> None:
+    dataloader = DataLoader(embed_dir)
+    from_pool, to_pool = MATRICES[matrix]
+    from_df, from_features = dataloader.load_data(from_pool), dataloader.load_features(from_pool)
+    if from_pool == to_pool:
+        to_df, to_features = from_df, from_features
+    else:
+        to_df, to_features = dataloader.load_data(to_pool), dataloader.load_features(to_pool)
+    scorer = SCORERS[kind](
+        ScorerConfig(**config_params),
+        from_df,
+        to_df,
+        same_pool=from_pool == to_pool,
+        from_features=from_features,
+        to_features=to_features,
+    )
+    scorer.calculate_score_matrix(n_workers=n_workers, checkpoint=checkpoint)
+
+
+def _aggregate_job(
+    score_dir: str, matrices: tuple[str, ...], aggregation: dict, exclusions_path: str, path: str
+) -> None:
+    # forward preference, forward similarity[, backward preference, backward similarity]
+    scores = [
+        np.load(os.path.join(score_dir, f"{matrix}_{kind}", "score_matrix.npy"), mmap_mode="r")
+        for matrix in matrices
+        for kind in SCORERS
+    ]
+    with np.load(exclusions_path) as exclusions:
+        exclusions = dict(exclusions)
+    # written tile by tile straight into the float32 file
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=scores[0].shape)
+    aggregate_scores_blocked(*scores, **aggregation, **exclusions, out=out)
+    out.flush()
+
+
+def _match_job(
+    final_path: str, same_group_method: str | None, rows_ids: np.ndarray, columns_ids: np.ndarray, path: str
+) -> None:
+    final = np.load(final_path)
+    pairs = _match_pairs(final, same_group_method)
+    matched = pd.DataFrame(
+        {
+            "applicant1_id": [rows_ids[i] for i, _ in pairs],
+            "applicant2_id": [columns_ids[j] for _, j in pairs],
+            "score": [final[i, j] for i, j in pairs],
+        }
+    )
+    if same_group_method is None:
+        # 03_matching-round1 lists the heterosexual pairs best first
+        matched = matched.sort_values("score", ascending=False, kind="stable")
+    matched.to_csv(path, index=False)
+
+
+class Pipeline:
+    """
+    One matching round end to end, without the notebooks:
+
+        extract     applicants from the database, split into the four pools
+                    (01_make_embeddings)
+        embed       text embeddings of new / edited applicants
+        features    the pools' FeatureStores
+        score       the eight preference / similarity matrices
+                    (03_matching-round1), resumable through ScoreCheckpoint
+        exclude     discarded matches and no-response applicants as matrix
+                    indices (06_matching-round2)
+        aggregate   the FM, MM and FF final matrices, with the exclusions
+        match       hungarian / same-group matching, and the round's
+                    matched_pairs in the notebook's format
+        assign      mentors of the matched pairs (04_07_write_match_to_db)
+        write       matched_pairs_<round>.csv, new_matches_<round>.csv and
+                    unmatchable_<round>.csv (02_find_applicants_cant_match) in
+                    output_dir
+
+    Every item of a stage (a pool, a score matrix, a final matrix, ...) is
+    cached under work_dir with the key of its inputs: the upstream items'
+    keys plus the settings it depends on. An item whose key is unchanged is
+    skipped, so re-running after e.g. a config change only re-scores, and a
+    run with nothing new only reads the database. Items of a stage run in
+    parallel processes across the pools.
+
+    Nothing is written to the database; insert output_dir/new_matches_<round>.csv
+    with the backend's `manage.py write_matches`, run with DJANGO_DB_PATH set
+    to db_path so that it writes the database the pipeline read.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "db.sqlite3",
+        round_number: int = 1,
+        work_dir: str | None = None,
+        output_dir: str = "./match_result/",
+        params: dict | None = None,
+        mentor_config: dict | None = None,
+        no_response: str | None = None,
+        model_name: str | None = None,
+        cpu: bool = False,
+        embedding_cache: str = "./embedding_cache/",
+        same_group_method: str = "blossom",
+        n_workers: int | None = None,
+        force: bool = False,
+    ):
+        """
+        Args:
+            work_dir: cached artifacts, ./pipeline/round<round_number>/ by
+                      default.
+            params: ScorerConfig fields plus max_score / minmax_ratio /
+                      no_response_penalty, as in ParameterSweep; defaults to
+                      the round 1 values and NO_RESPONSE_PENALTY.
+            mentor_config: {"claims": {mentor id: [applicant ids]},
+                      "max": {mentor id: int}, "group_id": int,
+                      "balance_schools": bool}, all optional (see
+                      mentors.assign_mentors).
+            no_response: CSV of the ids of applicants who did not respond
+                      last round, one per line without a header
+                      (match_result/no_response_applicants.csv).
+            model_name: embedding model, MODEL_NAME on the GPU or
+                      encoders.CPU_MODEL_NAME with cpu by default.
+            cpu: embed on the CPU backend (encoders) instead of the GPU.
+            force: ignore the cache and run every item of the selected stages;
+                      score matrices are recomputed, not resumed from their
+                      checkpoints.
+        """
+        self.db_path = db_path
+        self.round_number = round_number
+        self.work_dir = work_dir or f"./pipeline/round{round_number}/"
+        self.output_dir = output_dir
+        settings = {**AGGREGATION_DEFAULTS, **(params or {})}
+        self.aggregation = {key: settings.pop(key) for key in AGGREGATION_DEFAULTS}
+        self.aggregation["no_response_penalty"] = settings.pop("no_response_penalty", NO_RESPONSE_PENALTY)
+        self.config_params = settings
+        self.mentor_config = mentor_config or {}
+        self.no_response = no_response
+        if model_name is None and cpu:
+            from .encoders import CPU_MODEL_NAME
+
+            model_name = CPU_MODEL_NAME
+        self.model_name = model_name or MODEL_NAME
+        self.cpu = cpu
+        self.embedding_cache = embedding_cache
+        self.same_group_method = same_group_method
+        self.n_workers = n_workers or os.cpu_count() or 4
+        self.force = force
+
+        self.extract_dir = os.path.join(self.work_dir, "extract")
+        # one directory per model, so incremental embedding never mixes models
+        self.embed_dir = os.path.join(self.work_dir, "embed", re.sub(r"[^\w.-]", "_", self.model_name))
+        self.score_dir = os.path.join(self.work_dir, "score")
+        self.exclude_dir = os.path.join(self.work_dir, "exclude")
+        self.aggregate_dir = os.path.join(self.work_dir, "aggregate")
+        self.match_dir = os.path.join(self.work_dir, "match")
+        self.assign_dir = os.path.join(self.work_dir, "assign")
+
+        self.manifest_path = os.path.join(self.work_dir, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def run(self, stages: tuple[str, ...] = STAGES) -> None:
+        """
+        Runs the given stages in pipeline order. A stage left out must have
+        run before: its cached keys are what the later stages compare with.
+        """
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages: {sorted(unknown)}")
+        for stage in STAGES:
+            if stage in stages:
+                print(f"== {stage}")
+                getattr(self, stage)()
+
+    def _upstream(self, stage: str, item: str) -> str:
+        try:
+            return self.manifest[f"{stage}/{item}"]
+        except KeyError:
+            raise RuntimeError(f"{stage}/{item} has not been built yet, run the {stage} stage first") from None
+
+    def _is_fresh(self, stage: str, item: str, key: str, path: str) -> bool:
+        return not self.force and self.manifest.get(f"{stage}/{item}") == key and os.path.exists(path)
+
+    def _record(self, stage: str, item: str, key: str) -> None:
+        self.manifest[f"{stage}/{item}"] = key
+        if not os.path.exists(self.work_dir):
+            os.makedirs(self.work_dir)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _run_items(
+        self, stage: str, items: dict[str, tuple[str, str, Callable, Callable[[int], tuple]]]
+    ) -> None:
+        """
+        Runs the stale items of a stage, in parallel when there are several.
+        items maps an item name to (key, artifact path, job, args), where
+        args(n_workers) gives the job's arguments for the worker processes
+        each job may use itself.
+        """
+        stale = {}
+        for item, (key, path, job, args) in items.items():
+            if self._is_fresh(stage, item, key, path):
+                print(f"{stage}/{item}: up to date")
+            else:
+                stale[item] = (key, path, job, args)
+        if not stale:
+            return
+
+        outer = min(self.n_workers, len(stale))
+        inner = max(1, self.n_workers // outer)
+        if outer == 1:
+            for item, (key, _, job, args) in stale.items():
+                print(f"{stage}/{item}: running")
+                job(*args(inner))
+                self._record(stage, item, key)
+            return
+        with ProcessPoolExecutor(max_workers=outer) as executor:
+            futures = {item: executor.submit(job, *args(inner)) for item, (_, _, job, args) in stale.items()}
+            print(f"{stage}: running {', '.join(futures)} in {outer} processes")
+            for item, future in futures.items():
+                future.result()
+                self._record(stage, item, stale[item][0])
+
+    def extract(self) -> None:
+        """
+        Always reads the database (a streamed read-only query); a pool is
+        only rewritten, and its key only changes, when its rows changed.
+        """
+        pools = MatchingUtilities(self.db_path).load_and_clean_data()
+        dataloader = DataLoader(self.extract_dir)
+        for pool, df in zip(POOLS, pools):
+            key = _frame_fingerprint(df)
+            if self._is_fresh("extract", pool, key, os.path.join(self.extract_dir, pool)):
+                print(f"extract/{pool}: unchanged, {len(df)} applicants")
+                continue
+            dataloader.save_data(df, pool, features=False)
+            self._record("extract", pool, key)
+
+    def embed(self) -> None:
+        """
+        Pools run one after another on the one model, which is only loaded
+        when a pool changed. Applicants embedded by the previous run are
+        reused (transform_incremental), and texts go through the
+        EmbeddingCache.
+        """
+        stale = []
+        for pool in POOLS:
+            key = _key(self._upstream("extract", pool), self.model_name)
+            if self._is_fresh("embed", pool, key, os.path.join(self.embed_dir, pool)):
+                print(f"embed/{pool}: up to date")
+            else:
+                stale.append((pool, key))
+        if not stale:
+            return
+
+        from .embedding import EmbeddingUtilities
+        from .embedding_cache import EmbeddingCache
+
+        model = _load_model(self.model_name, self.cpu)
+        embedder = EmbeddingUtilities(model, EmbeddingCache(self.model_name, self.embedding_cache))
+        extracted, embedded = DataLoader(self.extract_dir), DataLoader(self.embed_dir)
+        try:
+            for pool, key in stale:
+                print(f"embed/{pool}: running")
+                previous = embedded.load_data(pool) if embedded.exists(pool) else None
+                df = embedder.transform_incremental(extracted.load_data(pool), previous)
+                embedded.save_data(df, pool, features=False)
+                self._record("embed", pool, key)
+        finally:
+            if hasattr(model, "close"):
+                model.close()
+
+    def features(self) -> None:
+        self._run_items(
+            "features",
+            {
+                pool: (
+                    self._upstream("embed", pool),
+                    os.path.join(self.embed_dir, pool, "features.npz"),
+                    _features_job,
+                    lambda n, pool=pool: (self.embed_dir, pool),
+                )
+                for pool in POOLS
+            },
+        )
+
+    def score(self) -> None:
+        config_hash = ScorerConfig(**self.config_params).fingerprint()
+        items = {}
+        for matrix, (from_pool, to_pool) in MATRICES.items():
+            for kind in SCORERS:
+                name = f"{matrix}_{kind}"
+                checkpoint = os.path.join(self.score_dir, name)
+                if self.force:
+                    # otherwise the job would resume the checkpoint, or just
+                    # reload it when it finished
+                    ScoreCheckpoint(checkpoint).reset()
+                items[name] = (
+                    _key(kind, config_hash, self._upstream("features", from_pool), self._upstream("features", to_pool)),
+                    os.path.join(checkpoint, "score_matrix.npy"),
+                    _score_job,
+                    lambda n, matrix=matrix, kind=kind, checkpoint=checkpoint: (
+                        self.embed_dir, matrix, kind, self.config_params, checkpoint, n
+                    ),
+                )
+        self._run_items("score", items)
+
+    def exclude(self) -> None:
+        """
+        Reads the discarded matches from the database (and the no-response
+        list), so a match discarded since the last run re-aggregates. Ids
+        become rows through the pools' IdIndex in one lookup per list.
+        """
+        with closing(MatchingUtilities(self.db_path).connect()) as connection:
+            discarded = pd.read_sql_query(
+                "SELECT applicant1_id, applicant2_id FROM match WHERE discarded = 1", connection
+            )
+        no_response = []
+        if self.no_response is not None:
+            no_response = pd.read_csv(self.no_response, header=None)[0].tolist()
+
+        id_index = DataLoader(self.embed_dir).load_id_index()
+        excluded = {
+            group: id_index.pairs(discarded["applicant1_id"], discarded["applicant2_id"], rows_pool, columns_pool)
+            for group, (_, rows_pool, columns_pool) in GROUPS.items()
+        }
+        outside = len(discarded) - sum(len(pairs) for pairs in excluded.values())
+        if outside:
+            print(f"exclude: {outside} discarded matches are not within the current pools")
+        unknown = id_index.unknown(no_response)
+        if unknown:
+            print(f"exclude: {len(unknown)} no-response applicants are not in the current pools")
+
+        if not os.path.exists(self.exclude_dir):
+            os.makedirs(self.exclude_dir)
+        for group, (_, rows_pool, columns_pool) in GROUPS.items():
+            path = os.path.join(self.exclude_dir, f"{group}.npz")
+            exclusions = {
+                "excluded_pairs": excluded[group],
+                "penalized_rows": id_index.rows(no_response, rows_pool),
+                "penalized_columns": id_index.rows(no_response, columns_pool),
+            }
+            key = _key(
+                self._upstream("embed", rows_pool),
+                self._upstream("embed", columns_pool),
+                {name: array.tolist() for name, array in exclusions.items()},
+            )
+            if self._is_fresh("exclude", group, key, path):
+                print(f"exclude/{group}: up to date")
+                continue
+            np.savez(path, **exclusions)
+            self._record("exclude", group, key)
+            print(
+                f"exclude/{group}: {len(exclusions['excluded_pairs'])} discarded pairs, "
+                f"{len(exclusions['penalized_rows'])} + {len(exclusions['penalized_columns'])} no-response applicants"
+            )
+
+    def aggregate(self) -> None:
+        if not os.path.exists(self.aggregate_dir):
+            os.makedirs(self.aggregate_dir)
+        items = {}
+        for group, (matrices, _, _) in GROUPS.items():
+            path = os.path.join(self.aggregate_dir, f"{group}.npy")
+            exclusions_path = os.path.join(self.exclude_dir, f"{group}.npz")
+            score_keys = [self._upstream("score", f"{matrix}_{kind}") for matrix in matrices for kind in SCORERS]
+            items[group] = (
+                _key(score_keys, self._upstream("exclude", group), self.aggregation),
+                path,
+                _aggregate_job,
+                lambda n, matrices=matrices, exclusions_path=exclusions_path, path=path: (
+                    self.score_dir, matrices, self.aggregation, exclusions_path, path
+                ),
+            )
+        self._run_items("aggregate", items)
+
+    def match(self) -> None:
+        if not os.path.exists(self.match_dir):
+            os.makedirs(self.match_dir)
+        id_index = DataLoader(self.embed_dir).load_id_index()
+        ids = {pool: id_index.ids(pool) for pool in POOLS}
+        items = {}
+        for group, (_, rows_pool, columns_pool) in GROUPS.items():
+            method = None if rows_pool != columns_pool else self.same_group_method
+            path = os.path.join(self.match_dir, f"{group}.csv")
+            items[group] = (
+                _key(self._upstream("aggregate", group), method),
+                path,
+                _match_job,
+                lambda n, group=group, method=method, path=path, rows_pool=rows_pool, columns_pool=columns_pool: (
+                    os.path.join(self.aggregate_dir, f"{group}.npy"), method, ids[rows_pool], ids[columns_pool], path
+                ),
+            )
+        self._run_items("match", items)
+
+        path = os.path.join(self.match_dir, "matched_pairs.csv")
+        key = _key([self._upstream("match", group) for group in GROUPS], self.round_number)
+        if self._is_fresh("match", "matched_pairs", key, path):
+            return
+        # 03_matching-round1: each pair in random order, seeded with the round
+        rng = random.Random(self.round_number)
+        paired_ids = []
+        for group in GROUPS:
+            matched = pd.read_csv(os.path.join(self.match_dir, f"{group}.csv"))
+            for id1, id2 in zip(matched["applicant1_id"], matched["applicant2_id"]):
+                # the notebook samples (male, female) for the heterosexual pairs
+                paired_ids.append(rng.sample((id2, id1) if group == "FM" else (id1, id2), 2))
+        pd.DataFrame(paired_ids, columns=["applicant1_id", "applicant2_id"]).to_csv(path, index=False)
+        self._record("match", "matched_pairs", key)
+        print(f"match: {len(paired_ids)} pairs")
+
+    def assign(self) -> None:
+        """
+        Reads the mentors' current loads from the database, so a match
+        written or discarded since the last run re-assigns.
+        """
+        with closing(MatchingUtilities(self.db_path).connect()) as connection:
+            mentor_loads = load_mentor_loads(connection, self.mentor_config.get("group_id", 1))
+        path = os.path.join(self.assign_dir, "assignments.csv")
+        key = _key(self._upstream("match", "matched_pairs"), mentor_loads, self.mentor_config)
+        if self._is_fresh("assign", "assignments", key, path):
+            print("assign/assignments: up to date")
+            return
+
+        matches = pd.read_csv(os.path.join(self.match_dir, "matched_pairs.csv"))
+        matches = matches.sample(frac=1, random_state=self.round_number, ignore_index=True)
+        schools = None
+        if self.mentor_config.get("balance_schools"):
+            extracted = DataLoader(self.extract_dir)
+            schools = {}
+            for pool in POOLS:
+                df = extracted.load_data(pool)
+                schools.update(zip(df["id"], df["school"]))
+        assignments = assign_mentors(
+            matches, mentor_loads, self.mentor_config.get("claims"), self.mentor_config.get("max"), schools
+        )
+        if len(assignments) < len(matches):
+            print(f"assign: {len(matches) - len(assignments)} matches left without a mentor, every mentor is full")
+        if not os.path.exists(self.assign_dir):
+            os.makedirs(self.assign_dir)
+        assignments.to_csv(path, index=False)
+        self._record("assign", "assignments", key)
+
+    def write(self) -> None:
+        paths = {
+            name: os.path.join(self.output_dir, f"{name}_{self.round_number}.csv")
+            for name in ("matched_pairs", "new_matches", "unmatchable")
+        }
+        score_keys = [self._upstream("score", f"{matrix}_preference") for matrix in MATRICES]
+        key = _key(self._upstream("match", "matched_pairs"), self._upstream("assign", "assignments"), score_keys)
+        if all(self._is_fresh("write", name, key, path) for name, path in paths.items()):
+            print("write: up to date")
+            return
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        pd.read_csv(os.path.join(self.match_dir, "matched_pairs.csv")).to_csv(paths["matched_pairs"], index=False)
+        assignments = pd.read_csv(os.path.join(self.assign_dir, "assignments.csv"))
+        new_matches_frame(assignments, self.round_number).to_csv(paths["new_matches"], index=False)
+
+        # applicants nobody qualifies for, from their side
+        id_index = DataLoader(self.embed_dir).load_id_index()
+        unmatchable = []
+        for matrix, (from_pool, _) in MATRICES.items():
+            preference = np.load(os.path.join(self.score_dir, f"{matrix}_preference", "score_matrix.npy"), mmap_mode="r")
+            invalid = np.max(preference, axis=1, initial=-np.inf) == -np.inf
+            unmatchable += [(matrix, applicant_id) for applicant_id in id_index.ids(from_pool)[invalid]]
+        pd.DataFrame(unmatchable, columns=["matrix", "applicant_id"]).to_csv(paths["unmatchable"], index=False)
+
+        for name in paths:
+            self._record("write", name, key)
+        print(f"write: {len(assignments)} matches, {len(unmatchable)} unmatchable applicants -> {self.output_dir}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m Matcher.pipeline",
+        description="Runs a matching round from the database to match_result CSVs, skipping cached stages.",
+    )
+    parser.add_argument("--db", default="db.sqlite3", help="SQLite database (default: %(default)s)")
+    parser.add_argument("--round", type=int, default=1, dest="round_number")
+    parser.add_argument("--work-dir", help="cached artifacts (default: ./pipeline/round<round>/)")
+    parser.add_argument("--output", default="./match_result/", help="output directory (default: %(default)s)")
+    parser.add_argument("--params", help="JSON file of ScorerConfig fields plus max_score / minmax_ratio")
+    parser.add_argument(
+        "--mentors", help='JSON file of {"claims": {...}, "max": {...}, "group_id": 1, "balance_schools": false}'
+    )
+    parser.add_argument("--no-response", help="CSV of the ids of last round's no-response applicants")
+    parser.add_argument("--model", help=f"embedding model (default: {MODEL_NAME}, or the CPU model with --cpu)")
+    parser.add_argument("--cpu", action="store_true", help="embed on the CPU backend (see Matcher.encoders)")
+    parser.add_argument("--embedding-cache", default="./embedding_cache/")
+    parser.add_argument(
+        "--same-group-method",
+        choices=("blossom", "greedy"),
+        default="blossom",
+        help="FF / MM matching: exact blossom (pure-Python networkx, about 15 s at 600 applicants "
+        "and cubic beyond) or the approximate but much faster greedy (default: %(default)s)",
+    )
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to run (default: all)")
+    parser.add_argument("--force", action="store_true", help="rebuild the selected stages even if cached")
+    args = parser.parse_args(argv)
+
+    def load_json(path: str | None) -> dict | None:
+        if path is None:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    Pipeline(
+        db_path=args.db,
+        round_number=args.round_number,
+        work_dir=args.work_dir,
+        output_dir=args.output,
+        params=load_json(args.params),
+        mentor_config=load_json(args.mentors),
+        no_response=args.no_response,
+        model_name=args.model,
+        cpu=args.cpu,
+        embedding_cache=args.embedding_cache,
+        same_group_method=args.same_group_method,
+        n_workers=args.workers,
+        force=args.force,
+    ).run(tuple(args.stages))
+
+
+if __name__ == "__main__":
+    main()
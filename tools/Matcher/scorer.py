@@ -1,12 +1,27 @@
 import pandas as pd
 import numpy as np
 import abc
+import hashlib
+import json
 import os
 from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from scipy import sparse
 from typing import Literal, Tuple, Optional
 import logging
 from tqdm import tqdm
 
+from .checkpoint import ScoreCheckpoint
+from .pair_features import PairFeatures
+from .features import (
+    FeatureStore,
+    GRADES,
+    LOCATIONS,
+    MBTI_DIMENSIONS,
+    MBTI_LETTERS,
+    REPLY_FREQUENCIES,
+)
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logger.addHandler(logging.StreamHandler())
@@ -29,6 +44,77 @@ def _score_cell(cell_ij: tuple[int, int]) -> tuple[int, int, float]:
     return (i, j, s)
 
 
+# Module-level state for row-block worker processes (set by _init_block_worker)
+_worker_block = None
+
+
+def _to_shared_memory(
+    arrays: dict[str, np.ndarray],
+) -> tuple[list[shared_memory.SharedMemory], dict[str, tuple]]:
+    """Copies arrays into shared memory; returns the segments and their specs."""
+    segments, specs = [], {}
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        specs[key] = (segment.name, array.shape, array.dtype.str)
+    return segments, specs
+
+
+def _from_shared_memory(
+    specs: dict[str, tuple],
+) -> tuple[list[shared_memory.SharedMemory], dict[str, np.ndarray]]:
+    """Attaches to segments created by _to_shared_memory, without copying."""
+    segments, arrays = [], {}
+    for key, (name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        segments.append(segment)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    return segments, arrays
+
+
+def _init_block_worker(
+    scorer_class: type,
+    config: "ScorerConfig",
+    same_pool: bool,
+    from_specs,
+    to_specs,
+    out_specs,
+) -> None:
+    global _worker_block
+    segments, from_arrays = _from_shared_memory(from_specs)
+    more_segments, to_arrays = _from_shared_memory(to_specs)
+    out_specs = dict(out_specs)
+    # a checkpointed run writes into the memory-mapped checkpoint instead
+    out_path = out_specs.pop("score_matrix_path", None)
+    out_segments, out = _from_shared_memory(out_specs)
+    if out_path is not None:
+        out["score_matrix"] = np.load(out_path, mmap_mode="r+")
+    _worker_block = (
+        scorer_class,
+        config,
+        same_pool,
+        from_arrays,
+        to_arrays,
+        out.get("score_matrix"),
+        segments + more_segments + out_segments,  # keep the mappings alive
+    )
+
+
+def _score_rows(rows: tuple[int, int]) -> tuple[int, int]:
+    """Scores one row block straight into the shared output matrix."""
+    scorer_class, config, same_pool, from_arrays, to_arrays, out, _ = _worker_block
+    scorer_class._write_block(config, same_pool, from_arrays, to_arrays, out, *rows)
+    return rows
+
+
+def _score_rows_sparse(rows: tuple[int, int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Scores one row block and returns its finite scores as COO triplets."""
+    scorer_class, config, same_pool, from_arrays, to_arrays, _, _ = _worker_block
+    return scorer_class._sparse_block(config, same_pool, from_arrays, to_arrays, *rows)
+
+
 def scaled_sigmoid(x: float) -> float:
     """
     Scaled sigmoid function with a range of 0 to 100.
@@ -56,6 +142,224 @@ def cosine_similarity_matrix(A: np.ndarray, B: np.ndarray) -> np.ndarray:
     return dot_product / (norm_A * norm_B.T)
 
 
+# Upper bound on the (applicants, items, to_applicants, to_items) gather done
+# per block by _score_item_sets
+_ITEM_BLOCK_BYTES = 128 * 1024 * 1024
+
+
+def _normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def _lookup(mapping: dict, vocabulary: tuple, codes: np.ndarray) -> np.ndarray:
+    """
+    mapping[vocabulary[code]] for every code; only the codes in use need to
+    be in mapping.
+    """
+    used = np.unique(codes)
+    table = np.zeros(len(vocabulary))
+    table[used] = [mapping[vocabulary[code]] for code in used]
+    return table[codes]
+
+
+def _encode_item_sets(
+    from_flat: np.ndarray,
+    from_offsets: np.ndarray,
+    to_flat: np.ndarray,
+    to_offsets: np.ndarray,
+) -> tuple[dict, dict]:
+    """
+    Packs two list-valued embedding columns, each given as a flat (items,
+    dim) matrix plus per-applicant offsets (see FeatureStore), into padded
+    item-index matrices. Identical item vectors are stored once and the
+    cosine between every distinct from-item and to-item is computed with one
+    matrix multiply.
+
+    Returns:
+        from side: "items" (n, max_k) rows into "similarity".
+        to side:   "items" (m, max_k) columns into "similarity";
+                   "similarity" (from_items + 1, to_items + 1) cosine table
+                   whose last row and column are -inf. Padding slots point
+                   at them, so padding never wins a max.
+    """
+    vectors = np.concatenate(
+        [np.asarray(from_flat, dtype=np.float32), np.asarray(to_flat, dtype=np.float32)]
+    )
+    if len(vectors):
+        vectors, item_ids = np.unique(vectors, axis=0, return_inverse=True)
+        item_ids = item_ids.reshape(-1)
+    else:
+        item_ids = np.zeros(0, dtype=np.intp)
+
+    def pack(ids: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        lengths = np.diff(offsets)
+        items = np.full((len(lengths), lengths.max(initial=0)), -1, dtype=np.intp)
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        items[rows, np.arange(len(ids)) - np.repeat(offsets[:-1], lengths)] = ids
+        return items
+
+    from_items = pack(item_ids[: len(from_flat)], from_offsets)
+    to_items = pack(item_ids[len(from_flat) :], to_offsets)
+    unit_vectors = _normalize_rows(vectors)
+
+    from_used = np.unique(from_items[from_items >= 0])
+    to_used = np.unique(to_items[to_items >= 0])
+    similarity = np.full(
+        (len(from_used) + 1, len(to_used) + 1), -np.inf, dtype=np.float32
+    )
+    similarity[:-1, :-1] = unit_vectors[from_used] @ unit_vectors[to_used].T
+
+    from_local = np.where(
+        from_items >= 0, np.searchsorted(from_used, from_items), len(from_used)
+    )
+    to_local = np.where(
+        to_items >= 0, np.searchsorted(to_used, to_items), len(to_used)
+    )
+    return {"items": from_local}, {"items": to_local, "similarity": similarity}
+
+
+def _score_item_sets(
+    similarity: np.ndarray,
+    from_items: np.ndarray,
+    to_items: np.ndarray,
+    *,
+    reward_multiplier: float,
+    bonus_threshold: Optional[float],
+    bonus_multiplier: Optional[float],
+) -> np.ndarray:
+    """
+    Batched SimilarityScorer._score_matrix_similarity over item sets encoded
+    by _encode_item_sets: for a block of from-applicants, the best match of
+    each of their items against every to-applicant comes from one gather +
+    max over the cosine table.
+    """
+    n, m = len(from_items), len(to_items)
+    score = np.zeros((n, m), dtype=np.float64)
+    if n == 0 or m == 0:
+        return score
+
+    present = from_items < similarity.shape[0] - 1
+    norm = np.sqrt(np.maximum(present.sum(axis=1) - 2, 1))
+    bytes_per_row = max(1, from_items.shape[1] * to_items.size * similarity.itemsize)
+    block = max(1, _ITEM_BLOCK_BYTES // bytes_per_row)
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        items = from_items[start:stop]
+        used, position = np.unique(items, return_inverse=True)
+        # (used items, m): best match of each distinct item inside every to-applicant
+        best_by_item = similarity[used][:, to_items].max(axis=2)
+        best = best_by_item[position.reshape(items.shape)]  # (block, max_k, m)
+        score[start:stop] = _sum_item_scores(
+            best,
+            present[start:stop, :, None],
+            axis=1,
+            reward_multiplier=reward_multiplier,
+            bonus_threshold=bonus_threshold,
+            bonus_multiplier=bonus_multiplier,
+        ) / norm[start:stop, None]
+    return score
+
+
+def _score_item_pairs(
+    similarity: np.ndarray,
+    from_items: np.ndarray,
+    to_items: np.ndarray,
+    *,
+    reward_multiplier: float,
+    bonus_threshold: Optional[float],
+    bonus_multiplier: Optional[float],
+) -> np.ndarray:
+    """
+    _score_item_sets for a list of pairs: from_items[p] is scored against
+    to_items[p] only.
+    """
+    p = len(from_items)
+    score = np.zeros(p, dtype=np.float64)
+    present = from_items < similarity.shape[0] - 1
+    norm = np.sqrt(np.maximum(present.sum(axis=1) - 2, 1))
+    bytes_per_pair = max(1, from_items.shape[1] * to_items.shape[1] * similarity.itemsize)
+    block = max(1, _ITEM_BLOCK_BYTES // bytes_per_pair)
+
+    for start in range(0, p, block):
+        stop = min(start + block, p)
+        # (block, from max_k, to max_k) -> best match of every from-item
+        best = similarity[
+            from_items[start:stop, :, None], to_items[start:stop, None, :]
+        ].max(axis=2)
+        score[start:stop] = _sum_item_scores(
+            best,
+            present[start:stop],
+            axis=1,
+            reward_multiplier=reward_multiplier,
+            bonus_threshold=bonus_threshold,
+            bonus_multiplier=bonus_multiplier,
+        ) / norm[start:stop]
+    return score
+
+
+def _best_item_matches(
+    similarity: np.ndarray, from_items: np.ndarray, to_items: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The raw input of _score_item_sets: the best match of every real
+    from-item inside every to-applicant, as (items, m) float32 rows in
+    applicant order plus the (n + 1) offsets of each applicant's rows.
+    """
+    present = from_items < similarity.shape[0] - 1
+    offsets = np.concatenate([[0], np.cumsum(present.sum(axis=1))]).astype(np.int64)
+    used, position = np.unique(from_items[present], return_inverse=True)
+    best_by_item = np.empty((len(used), len(to_items)), dtype=similarity.dtype)
+    block = max(1, _ITEM_BLOCK_BYTES // max(1, to_items.size * similarity.itemsize))
+    for start in range(0, len(used), block):
+        best_by_item[start : start + block] = similarity[used[start : start + block]][
+            :, to_items
+        ].max(axis=2)
+    return best_by_item[position.reshape(-1)], offsets
+
+
+def _sum_best_item_matches(
+    best: np.ndarray,
+    offsets: np.ndarray,
+    *,
+    reward_multiplier: float,
+    bonus_threshold: Optional[float],
+    bonus_multiplier: Optional[float],
+) -> np.ndarray:
+    """_score_item_sets over the output of _best_item_matches."""
+    lengths = np.diff(offsets)
+    score = np.zeros((len(lengths), best.shape[1]), dtype=np.float64)
+    non_empty = lengths > 0
+    if non_empty.any():
+        scores = best * reward_multiplier
+        if bonus_threshold is not None and bonus_multiplier is not None:
+            scores = np.where(best >= bonus_threshold, scores * bonus_multiplier, scores)
+        # the empty applicants' segments have length 0, so skipping their
+        # starts leaves every other segment intact
+        score[non_empty] = np.add.reduceat(
+            scores, offsets[:-1][non_empty], axis=0, dtype=np.float64
+        )
+    return score / np.sqrt(np.maximum(lengths - 2, 1))[:, None]
+
+
+def _sum_item_scores(
+    best: np.ndarray,
+    present: np.ndarray,
+    axis: int,
+    *,
+    reward_multiplier: float,
+    bonus_threshold: Optional[float],
+    bonus_multiplier: Optional[float],
+) -> np.ndarray:
+    """Applies the _score_matrix_similarity reward/bonus to best matches and sums the real items."""
+    scores = best * reward_multiplier
+    if bonus_threshold is not None and bonus_multiplier is not None:
+        scores = np.where(best >= bonus_threshold, scores * bonus_multiplier, scores)
+    scores = np.where(present, scores, 0)
+    return scores.sum(axis=axis, dtype=np.float64)
+
+
 class ScorerConfig:
     GRADE_MAP = {
         "UG1": 1,
@@ -209,14 +513,68 @@ class ScorerConfig:
         self.wish_bonus_threshold = wish_bonus_threshold
         self.wish_bonus_multiplier = wish_bonus_multiplier
 
+    def fingerprint(self) -> str:
+        """sha256 of every setting, e.g. to tell whether saved scores are stale."""
+        settings = json.dumps(
+            {
+                "GRADE_MAP": self.GRADE_MAP,
+                "LOCATION_MAP": self.LOCATION_MAP,
+                "MBTI_MAP": self.MBTI_MAP,
+                **vars(self),
+            },
+            sort_keys=True,
+            # mbti_transform is a function
+            default=lambda value: getattr(value, "__name__", repr(value)),
+        )
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
 
 class Scorer(abc.ABC):
+    # Value put on the diagonal in same_pool mode (None leaves it as scored)
+    same_pool_diagonal: Optional[float] = None
+    # Whether _score_triangle_block is implemented (score[i, j] and score[j, i]
+    # come from the same pass), so same_pool mode only walks the upper triangle
+    scores_both_directions: bool = False
+
     def __init__(
-        self, config: ScorerConfig, from_df: pd.DataFrame, to_df: pd.DataFrame
+        self,
+        config: ScorerConfig,
+        from_df: pd.DataFrame,
+        to_df: pd.DataFrame,
+        same_pool: bool = False,
+        candidate_mask: Optional[np.ndarray] = None,
+        from_features: Optional[FeatureStore] = None,
+        to_features: Optional[FeatureStore] = None,
+        pair_features: Optional[PairFeatures] = None,
     ):
+        """
+        Args:
+            same_pool: from_df and to_df are the same pool (FF / MM), so
+                       self-matches are excluded and, where the scorer
+                       supports it, each pair is only visited once.
+            candidate_mask: optional (len(from_df), len(to_df)) boolean mask,
+                       e.g. from FeasibilityIndex. Only pairs inside the mask
+                       are scored; every other cell is -inf.
+            from_features, to_features: compiled FeatureStores of the two
+                       pools, read by the vectorized scoring. Compiled from
+                       the DataFrames when not given; pass them to share one
+                       store between scorers.
+            pair_features: raw per-pair features for rescore, e.g. loaded
+                       with PairFeatures.load; computed on first use when
+                       not given.
+        """
+        if same_pool and len(from_df) != len(to_df):
+            raise ValueError("same_pool=True requires from_df and to_df to be the same pool")
+        if candidate_mask is not None and candidate_mask.shape != (len(from_df), len(to_df)):
+            raise ValueError("candidate_mask must have shape (len(from_df), len(to_df))")
         self.config = config
         self.from_df = from_df
         self.to_df = to_df
+        self.same_pool = same_pool
+        self.candidate_mask = candidate_mask
+        self.from_features = from_features
+        self.to_features = to_features
+        self.pair_features = pair_features
         self.score_matrix = np.zeros((len(from_df), len(to_df)))
 
     @abc.abstractmethod
@@ -225,9 +583,396 @@ class Scorer(abc.ABC):
     ) -> float:
         pass
 
-    def calculate_score_matrix(self, n_workers: int | None = None) -> np.ndarray:
+    def features(self) -> tuple[FeatureStore, FeatureStore]:
+        """The FeatureStores of from_df / to_df, compiled on first use."""
+        if self.from_features is None:
+            self.from_features = FeatureStore.from_dataframe(self.from_df)
+        if self.to_features is None:
+            self.to_features = (
+                self.from_features
+                if self.same_pool and self.to_df is self.from_df
+                else FeatureStore.from_dataframe(self.to_df)
+            )
+        return self.from_features, self.to_features
+
+    def rescore(self, config: Optional[ScorerConfig] = None) -> np.ndarray:
+        """
+        The score matrix under config (self.config by default), recombined
+        from self.pair_features. The first call computes them (a full
+        scoring pass); every later call, with any config, only reweights
+        the cached features, which is what parameter sweeps should use.
+        Agrees with calculate_score_matrix up to float rounding.
+        """
+        if self.pair_features is None:
+            self.compute_pair_features()
+        return self.score_pair_features(
+            config or self.config, self.pair_features, self.same_pool, self.candidate_mask
+        )
+
+    def compute_pair_features(self) -> PairFeatures:
+        """Computes (or recomputes) self.pair_features."""
+        self.pair_features = PairFeatures(self._compute_pair_features())
+        return self.pair_features
+
+    @classmethod
+    def score_pair_features(
+        cls,
+        config: ScorerConfig,
+        pair_features: PairFeatures,
+        same_pool: bool = False,
+        candidate_mask: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        rescore without a scorer instance, for pair features computed
+        elsewhere (e.g. loaded in a worker process).
+        """
+        score = cls._combine_pair_features(config, pair_features)
+        if candidate_mask is not None:
+            score[~candidate_mask] = -np.inf
+        if same_pool and cls.same_pool_diagonal is not None:
+            np.fill_diagonal(score, cls.same_pool_diagonal)
+        return score
+
+    @abc.abstractmethod
+    def _compute_pair_features(self) -> dict[str, np.ndarray]:
+        """The config-independent inputs of the score of every pair."""
+        pass
+
+    @staticmethod
+    @abc.abstractmethod
+    def _combine_pair_features(config: ScorerConfig, features: PairFeatures) -> np.ndarray:
+        """Scores every pair under config from _compute_pair_features' output."""
+        pass
+
+    @abc.abstractmethod
+    def _encode_applicants(self) -> tuple[dict, dict]:
+        """
+        Encodes from_df / to_df into numeric arrays for _score_block.
+        Arrays of the first dict are indexed by from-applicant (row blocks
+        slice them); the second dict holds everything else and is always
+        passed whole.
+        """
+        pass
+
+    @staticmethod
+    @abc.abstractmethod
+    def _score_block(
+        config: ScorerConfig, from_arrays: dict, to_arrays: dict
+    ) -> np.ndarray:
+        """Scores a block of from-applicants against every to-applicant."""
+        pass
+
+    @staticmethod
+    @abc.abstractmethod
+    def _score_pairs(
+        config: ScorerConfig,
+        from_arrays: dict,
+        to_arrays: dict,
+        rows: np.ndarray,
+        cols: np.ndarray,
+    ) -> np.ndarray:
+        """Scores only the pairs (rows[p], cols[p]) of a block."""
+        pass
+
+    @staticmethod
+    @abc.abstractmethod
+    def _score_triangle_block(
+        config: ScorerConfig, from_arrays: dict, to_arrays: dict, start: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Same-pool variant of _score_block for the from-applicants
+        start..start+b: returns (score[block, start:], score[start:, block]).
+        Only called when scores_both_directions is set.
+        """
+        pass
+
+    @classmethod
+    def _write_block(
+        cls,
+        config: ScorerConfig,
+        same_pool: bool,
+        from_arrays: dict,
+        to_arrays: dict,
+        out: np.ndarray,
+        start: int,
+        stop: int,
+    ) -> None:
+        block = {key: value[start:stop] for key, value in from_arrays.items()}
+        candidate_mask = block.pop("_candidate_mask", None)
+        if candidate_mask is not None:
+            rows, cols = np.nonzero(candidate_mask)
+            scores = np.full(candidate_mask.shape, -np.inf)
+            scores[rows, cols] = cls._score_pairs(config, block, to_arrays, rows, cols)
+            out[start:stop] = scores
+        elif same_pool and cls.scores_both_directions:
+            forward, backward = cls._score_triangle_block(config, block, to_arrays, start)
+            out[stop:, start:stop] = backward[stop - start :]
+            out[start:stop, start:] = forward
+        else:
+            out[start:stop] = cls._score_block(config, block, to_arrays)
+
+    def calculate_score_matrix(
+        self,
+        n_workers: int | None = None,
+        vectorized: bool = True,
+        chunk_size: int = 128,
+        checkpoint: str | None = None,
+    ) -> np.ndarray:
+        """
+        Calculates the whole score matrix.
+
+        By default the applicants are encoded into arrays once, placed in
+        shared memory, and each worker scores contiguous blocks of
+        chunk_size rows straight into a shared output matrix. With
+        n_workers=1 the blocks are scored in this process.
+        vectorized=False falls back to the per-cell score_for_one path.
+
+        With checkpoint (a directory, one per scorer), the blocks are
+        written to a memory-mapped matrix there and recorded as they
+        finish (see ScoreCheckpoint). Calling again with the same config,
+        applicants, candidate_mask and chunk_size skips the blocks already
+        done, or just maps the finished matrix if the run completed.
+        """
+        if checkpoint is not None and not vectorized:
+            raise ValueError("checkpoint requires vectorized=True")
+        if checkpoint is not None and self.score_matrix.size:
+            return self._calculate_score_matrix_checkpointed(n_workers, chunk_size, checkpoint)
+        if not vectorized:
+            self._calculate_score_matrix_per_cell(n_workers)
+        else:
+            self._calculate_score_matrix_blocks(n_workers, chunk_size)
+        if self.same_pool and self.same_pool_diagonal is not None:
+            np.fill_diagonal(self.score_matrix, self.same_pool_diagonal)
+        return self.score_matrix
+
+    def data_fingerprint(self) -> str:
+        """
+        sha256 of everything scored besides the config: both FeatureStores
+        and candidate_mask.
+        """
+        from_features, to_features = self.features()
+        data = hashlib.sha256()
+        data.update(from_features.fingerprint().encode("utf-8"))
+        data.update(to_features.fingerprint().encode("utf-8"))
+        if self.candidate_mask is not None:
+            data.update(np.packbits(self.candidate_mask).tobytes())
+        return data.hexdigest()
+
+    def checkpoint_key(self, chunk_size: int) -> dict:
+        """
+        Identifies a score matrix: the scorer, the config hash, the
+        data_fingerprint and the block layout.
+        """
+        return {
+            "scorer": type(self).__name__,
+            "config": self.config.fingerprint(),
+            "data": self.data_fingerprint(),
+            "same_pool": self.same_pool,
+            "chunk_size": chunk_size,
+        }
+
+    def _calculate_score_matrix_checkpointed(
+        self, n_workers: int | None, chunk_size: int, directory: str
+    ) -> np.ndarray:
+        checkpoint = ScoreCheckpoint(directory)
+        checkpoint.open(self.checkpoint_key(chunk_size), (len(self.from_df), len(self.to_df)))
+        if checkpoint.complete:
+            logger.info(f"Loaded finished score matrix from {directory}")
+        else:
+            if checkpoint.completed:
+                logger.info(f"Resuming from {directory}, {len(checkpoint.completed)} blocks already done")
+            self._calculate_score_matrix_blocks(n_workers, chunk_size, checkpoint)
+            if self.same_pool and self.same_pool_diagonal is not None:
+                np.fill_diagonal(checkpoint.matrix, self.same_pool_diagonal)
+            checkpoint.mark_complete()
+        self.score_matrix = checkpoint.matrix
+        return self.score_matrix
+
+    @classmethod
+    def _sparse_block(
+        cls,
+        config: ScorerConfig,
+        same_pool: bool,
+        from_arrays: dict,
+        to_arrays: dict,
+        start: int,
+        stop: int,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Scores the from-applicants start..stop and returns only their finite
+        scores as (rows, cols, data).
+        """
+        block = {key: value[start:stop] for key, value in from_arrays.items()}
+        candidate_mask = block.pop("_candidate_mask", None)
+        if candidate_mask is not None:
+            rows, cols = np.nonzero(candidate_mask)
+            data = cls._score_pairs(config, block, to_arrays, rows, cols)
+        else:
+            scores = cls._score_block(config, block, to_arrays)
+            rows, cols = np.nonzero(np.isfinite(scores))
+            data = scores[rows, cols]
+        rows = rows + start
+        keep = np.isfinite(data)
+        if same_pool and cls.same_pool_diagonal is not None:
+            # same_pool_diagonal is -inf, i.e. not stored
+            keep &= rows != cols
+        return rows[keep], cols[keep], data[keep]
+
+    def calculate_sparse_score_matrix(
+        self, n_workers: int | None = None, chunk_size: int = 128
+    ) -> sparse.csr_matrix:
+        """
+        Calculates the score matrix as a CSR matrix holding only the finite
+        scores; pairs that are not stored are -inf.
+
+        Scored block by block like calculate_score_matrix, but no dense
+        (n, m) matrix is ever allocated. Pass a candidate_mask (e.g.
+        FeasibilityIndex.mutual_mask) so that only candidate pairs are
+        scored; otherwise every finite score is kept.
+        """
         n, m = len(self.from_df), len(self.to_df)
-        indices = [(i, j) for i in range(n) for j in range(m)]
+        if n == 0 or m == 0:
+            return sparse.csr_matrix((n, m))
+
+        from_arrays, to_arrays = self._encode_applicants()
+        if self.candidate_mask is not None:
+            from_arrays["_candidate_mask"] = self.candidate_mask
+        blocks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+        workers = min(n_workers or os.cpu_count() or 4, len(blocks))
+
+        if workers <= 1:
+            parts = [
+                self._sparse_block(
+                    self.config, self.same_pool, from_arrays, to_arrays, start, stop
+                )
+                for start, stop in tqdm(blocks, desc="Calculating sparse score matrix")
+            ]
+        else:
+            parts = self._map_blocks_in_workers(
+                _score_rows_sparse, blocks, workers, from_arrays, to_arrays, {}
+            )
+
+        rows, cols, data = (np.concatenate(part) for part in zip(*parts))
+        return sparse.csr_matrix((data, (rows, cols)), shape=(n, m))
+
+    def _calculate_score_matrix_blocks(
+        self,
+        n_workers: int | None,
+        chunk_size: int,
+        checkpoint: ScoreCheckpoint | None = None,
+    ) -> np.ndarray:
+        n, m = len(self.from_df), len(self.to_df)
+        blocks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+        if checkpoint is not None:
+            self.score_matrix = checkpoint.matrix
+            blocks = [block for block in blocks if block not in checkpoint.completed]
+        if not blocks or m == 0:
+            return self.score_matrix
+
+        from_arrays, to_arrays = self._encode_applicants()
+        if self.candidate_mask is not None:
+            from_arrays["_candidate_mask"] = self.candidate_mask
+        workers = min(n_workers or os.cpu_count() or 4, len(blocks))
+
+        if workers <= 1:
+            for start, stop in tqdm(blocks, desc="Calculating score matrix"):
+                self._write_block(
+                    self.config,
+                    self.same_pool,
+                    from_arrays,
+                    to_arrays,
+                    self.score_matrix,
+                    start,
+                    stop,
+                )
+                if checkpoint is not None:
+                    checkpoint.mark_done((start, stop))
+            return self.score_matrix
+
+        if checkpoint is not None:
+            # workers write straight into the checkpoint file
+            self._map_blocks_in_workers(
+                _score_rows,
+                blocks,
+                workers,
+                from_arrays,
+                to_arrays,
+                {"score_matrix_path": checkpoint.matrix_path},
+                on_result=checkpoint.mark_done,
+            )
+            return self.score_matrix
+
+        out = shared_memory.SharedMemory(create=True, size=n * m * 8)
+        try:
+            out_specs = {"score_matrix": (out.name, (n, m), np.dtype(np.float64).str)}
+            self._map_blocks_in_workers(
+                _score_rows, blocks, workers, from_arrays, to_arrays, out_specs
+            )
+            self.score_matrix = np.ndarray((n, m), dtype=np.float64, buffer=out.buf).copy()
+        finally:
+            out.close()
+            out.unlink()
+        return self.score_matrix
+
+    def _map_blocks_in_workers(
+        self,
+        task,
+        blocks: list[tuple[int, int]],
+        workers: int,
+        from_arrays: dict,
+        to_arrays: dict,
+        out_specs: dict,
+        on_result=None,
+    ) -> list:
+        """
+        Places the encoded arrays in shared memory and maps task over the
+        row blocks in a process pool; returns the results in block order,
+        passing each one to on_result (if given) as it arrives.
+        """
+        logger.info(
+            f"Calculating score matrix with {workers} workers, {len(blocks)} blocks of {blocks[0][1] - blocks[0][0]} rows"
+        )
+        segments = []
+        try:
+            from_segments, from_specs = _to_shared_memory(from_arrays)
+            segments += from_segments
+            to_segments, to_specs = _to_shared_memory(to_arrays)
+            segments += to_segments
+
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_block_worker,
+                initargs=(
+                    type(self),
+                    self.config,
+                    self.same_pool,
+                    from_specs,
+                    to_specs,
+                    out_specs,
+                ),
+            ) as executor:
+                results = []
+                for result in tqdm(
+                    executor.map(task, blocks),
+                    total=len(blocks),
+                    desc="Calculating score matrix",
+                ):
+                    if on_result is not None:
+                        on_result(result)
+                    results.append(result)
+                return results
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    def _calculate_score_matrix_per_cell(self, n_workers: int | None = None) -> np.ndarray:
+        n, m = len(self.from_df), len(self.to_df)
+        if self.candidate_mask is None:
+            indices = [(i, j) for i in range(n) for j in range(m)]
+        else:
+            self.score_matrix[~self.candidate_mask] = -np.inf
+            indices = list(zip(*np.nonzero(self.candidate_mask)))
         if not indices:
             return self.score_matrix
         workers = n_workers or min(os.cpu_count() or 4, len(indices))
@@ -249,10 +994,292 @@ class Scorer(abc.ABC):
 
 
 class PreferenceScorer(Scorer):
+    same_pool_diagonal = -np.inf
+
     def __init__(
-        self, config: ScorerConfig, from_df: pd.DataFrame, to_df: pd.DataFrame
+        self,
+        config: ScorerConfig,
+        from_df: pd.DataFrame,
+        to_df: pd.DataFrame,
+        same_pool: bool = False,
+        candidate_mask: Optional[np.ndarray] = None,
+        from_features: Optional[FeatureStore] = None,
+        to_features: Optional[FeatureStore] = None,
+        pair_features: Optional[PairFeatures] = None,
     ):
-        super().__init__(config, from_df, to_df)
+        super().__init__(
+            config,
+            from_df,
+            to_df,
+            same_pool,
+            candidate_mask,
+            from_features,
+            to_features,
+            pair_features,
+        )
+
+    def _encode_applicants(self) -> tuple[dict, dict]:
+        """
+        Turns the FeatureStores into the arrays _score reads: the config
+        maps (GRADE_MAP, LOCATION_MAP, MBTI_MAP, reply_frequency_reward) are
+        resolved through the codes once, and preferred_wxid becomes a
+        column index into to_df.
+        """
+        config = self.config
+        source, target = self.features()
+
+        from_arrays = {
+            "preferred_grades": source["preferred_grades"],
+            "preferred_schools": source["preferred_schools"],
+            "same_location_only": source["same_location_only"],
+            "continue_match": ~source["continue_match"],
+            "timezone": source["timezone"],
+            "max_time_difference": source["max_time_difference"],
+            "location": source["location"],
+            "location_group": _lookup(config.LOCATION_MAP, LOCATIONS, source["location"]),
+            "grade_value": _lookup(config.GRADE_MAP, GRADES, source["grade"]),
+            "preferred_column": source.preferred_columns(target),
+        }
+        for dim in MBTI_DIMENSIONS:
+            from_arrays[f"mbti_{dim}_weight"] = config.mbti_multiplier * _lookup(
+                ScorerConfig.MBTI_MAP, MBTI_LETTERS, source[f"preferred_mbti_{dim}"]
+            )
+
+        to_arrays = {
+            # shift amounts into the preferred_* bitsets
+            "grade": target["grade"].astype(np.uint64),
+            "school": target["school"].astype(np.uint64),
+            "timezone": target["timezone"],
+            "location": target["location"],
+            "location_group": _lookup(config.LOCATION_MAP, LOCATIONS, target["location"]),
+            "grade_value": _lookup(config.GRADE_MAP, GRADES, target["grade"]),
+            "reply_frequency_reward": _lookup(
+                config.reply_frequency_reward, REPLY_FREQUENCIES, target["reply_frequency"]
+            ),
+        }
+        for dim in MBTI_DIMENSIONS:
+            to_arrays[f"mbti_{dim}"] = target[f"mbti_{dim}"]
+
+        return from_arrays, to_arrays
+
+    def _compute_pair_features(self) -> dict[str, np.ndarray]:
+        """
+        The pair-level parts of _score that do not depend on the config:
+        the two qualification checks, the time difference, the (from, to)
+        location and grade codes and the preferred_wxid hits. The MBTI and
+        reply-frequency terms only depend on one side and stay vectors.
+        """
+        source, target = self.features()
+        one = np.uint64(1)
+        unqualified = (
+            ((source["preferred_grades"][:, None] >> target["grade"].astype(np.uint64)) & one == 0)
+            | ((source["preferred_schools"][:, None] >> target["school"].astype(np.uint64)) & one == 0)
+            | (source["same_location_only"][:, None] & (source["location"][:, None] != target["location"]))
+            | ~source["continue_match"][:, None]
+        )
+        time_a = source["timezone"][:, None]
+        time_b = target["timezone"][None, :]
+        time_difference = np.minimum((time_a - time_b) % 24, (time_b - time_a) % 24)
+        features = {
+            "unqualified": unqualified,
+            "out_of_time_range": time_difference > source["max_time_difference"][:, None],
+            # whole and half hours, exact in float32
+            "time_difference": time_difference.astype(np.float32),
+            "location_pair": source["location"].astype(np.int16)[:, None] * len(LOCATIONS)
+            + target["location"],
+            "grade_pair": source["grade"].astype(np.int16)[:, None] * len(GRADES) + target["grade"],
+            "preferred": source.preferred_columns(target)[:, None]
+            == np.arange(len(target)),
+            "to:reply_frequency": target["reply_frequency"],
+        }
+        for dim in MBTI_DIMENSIONS:
+            features[f"from:preferred_mbti_{dim}"] = source[f"preferred_mbti_{dim}"]
+            features[f"to:mbti_{dim}"] = target[f"mbti_{dim}"]
+        return features
+
+    @staticmethod
+    def _combine_pair_features(config: ScorerConfig, features: PairFeatures) -> np.ndarray:
+        """_score over PairFeatures, adding the terms in the same order."""
+        score = np.full(
+            features["unqualified"].shape, config.base_preference_score, dtype=np.float64
+        )
+        score = np.where(features["unqualified"], score + config.unqualified_penalty, score)
+        score = np.where(
+            features["out_of_time_range"], score + config.unqualified_penalty, score
+        )
+        unqualified_score = score
+        unqualified = score == -np.inf
+
+        # time zone
+        time_difference = features["time_difference"].astype(np.float64)
+        timezone_penalty = config.timezone_difference_base_penalty * time_difference
+        timezone_penalty = np.where(
+            time_difference >= config.timezone_difference_penalty_multiplier_threshold,
+            timezone_penalty * config.timezone_difference_penalty_multiplier,
+            timezone_penalty,
+        )
+        score = score + timezone_penalty
+
+        # MBTI
+        for dim in MBTI_DIMENSIONS:
+            weight = config.mbti_multiplier * _lookup(
+                ScorerConfig.MBTI_MAP, MBTI_LETTERS, features[f"from:preferred_mbti_{dim}"]
+            )
+            score += weight[:, None] * features[f"to:mbti_{dim}"]
+
+        # location, tabulated for every (from, to) code pair
+        codes = np.arange(len(LOCATIONS))
+        location_group = _lookup(config.LOCATION_MAP, LOCATIONS, codes)
+        location_difference = np.abs(location_group[:, None] - location_group[None, :])
+        location_reward = np.where(
+            codes[:, None] == codes[None, :],
+            config.same_location_reward,
+            np.where(
+                location_difference == 0,
+                config.same_location_group_reward,
+                config.different_location_group_penalty * location_difference,
+            ),
+        )
+        score += location_reward.reshape(-1)[features["location_pair"]]
+
+        # grade
+        grade_value = _lookup(config.GRADE_MAP, GRADES, np.arange(len(GRADES)))
+        grade_difference = np.abs(grade_value[:, None] - grade_value[None, :])
+        grade_penalty = config.grade_difference_base_penalty * grade_difference
+        grade_penalty = np.where(
+            grade_difference >= config.grade_difference_penalty_multiplier_threshold,
+            grade_penalty * config.grade_difference_penalty_multiplier,
+            grade_penalty,
+        )
+        score += grade_penalty.reshape(-1)[features["grade_pair"]]
+
+        # reply_frequency
+        score += _lookup(
+            config.reply_frequency_reward, REPLY_FREQUENCIES, features["to:reply_frequency"]
+        )
+
+        score = np.where(unqualified, unqualified_score, score)
+        return np.where(features["preferred"], config.preferred_wxid_value, score)
+
+    @staticmethod
+    def _score_block(
+        config: ScorerConfig, from_arrays: dict, to_arrays: dict
+    ) -> np.ndarray:
+        n = len(from_arrays["timezone"])
+        m = len(to_arrays["timezone"])
+        return PreferenceScorer._score(
+            config, from_arrays, to_arrays, np.arange(n)[:, None], np.arange(m)[None, :]
+        )
+
+    @staticmethod
+    def _score_pairs(
+        config: ScorerConfig,
+        from_arrays: dict,
+        to_arrays: dict,
+        rows: np.ndarray,
+        cols: np.ndarray,
+    ) -> np.ndarray:
+        return PreferenceScorer._score(config, from_arrays, to_arrays, rows, cols)
+
+    @staticmethod
+    def _score_triangle_block(
+        config: ScorerConfig, from_arrays: dict, to_arrays: dict, start: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # from and to arrays hold different fields, so a block cannot be
+        # scored in both directions at once (scores_both_directions is False)
+        raise NotImplementedError("PreferenceScorer scores one direction at a time")
+
+    @staticmethod
+    def _score(
+        config: ScorerConfig,
+        from_arrays: dict,
+        to_arrays: dict,
+        rows: np.ndarray,
+        cols: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Array version of score_for_one over encoded applicants, for the cells
+        (rows, cols): either broadcastable index grids for a dense block or
+        two flat index arrays for a list of pairs. Every term is added in the
+        same order as score_for_one so the float results are bit-identical.
+        """
+
+        def a(key: str) -> np.ndarray:
+            return from_arrays[key][rows]
+
+        def b(key: str) -> np.ndarray:
+            return to_arrays[key][cols]
+
+        score = np.full(
+            np.broadcast_shapes(rows.shape, cols.shape),
+            config.base_preference_score,
+            dtype=np.float64,
+        )
+
+        # unqualified penalty
+        one = np.uint64(1)
+        unqualified = (
+            ((a("preferred_grades") >> b("grade")) & one == 0)
+            | ((a("preferred_schools") >> b("school")) & one == 0)
+            | (a("same_location_only") & (a("location") != b("location")))
+            | a("continue_match")
+        )
+        score = np.where(unqualified, score + config.unqualified_penalty, score)
+
+        time_a = a("timezone")
+        time_b = b("timezone")
+        time_difference = np.minimum((time_a - time_b) % 24, (time_b - time_a) % 24)
+        score = np.where(
+            time_difference > a("max_time_difference"),
+            score + config.unqualified_penalty,
+            score,
+        )
+        unqualified_score = score
+        unqualified = score == -np.inf
+
+        # time zone
+        timezone_penalty = config.timezone_difference_base_penalty * time_difference
+        timezone_penalty = np.where(
+            time_difference >= config.timezone_difference_penalty_multiplier_threshold,
+            timezone_penalty * config.timezone_difference_penalty_multiplier,
+            timezone_penalty,
+        )
+        score = score + timezone_penalty
+
+        # MBTI
+        for dim in ("ei", "sn", "tf", "jp"):
+            score += a(f"mbti_{dim}_weight") * b(f"mbti_{dim}")
+
+        # location
+        same_location = a("location") == b("location")
+        location_difference = np.abs(a("location_group") - b("location_group"))
+        score += np.where(
+            same_location,
+            config.same_location_reward,
+            np.where(
+                location_difference == 0,
+                config.same_location_group_reward,
+                config.different_location_group_penalty * location_difference,
+            ),
+        )
+
+        # grade
+        grade_difference = np.abs(a("grade_value") - b("grade_value"))
+        grade_penalty = config.grade_difference_base_penalty * grade_difference
+        grade_penalty = np.where(
+            grade_difference >= config.grade_difference_penalty_multiplier_threshold,
+            grade_penalty * config.grade_difference_penalty_multiplier,
+            grade_penalty,
+        )
+        score += grade_penalty
+
+        # reply_frequency
+        score += b("reply_frequency_reward")
+
+        score = np.where(unqualified, unqualified_score, score)
+        return np.where(
+            a("preferred_column") == cols, config.preferred_wxid_value, score
+        )
 
     def score_for_one(
         self, from_applicant: pd.Series, to_applicant: pd.Series
@@ -353,10 +1380,262 @@ class PreferenceScorer(Scorer):
 
 
 class SimilarityScorer(Scorer):
+    scores_both_directions = True
+
     def __init__(
-        self, config: ScorerConfig, from_df: pd.DataFrame, to_df: pd.DataFrame
+        self,
+        config: ScorerConfig,
+        from_df: pd.DataFrame,
+        to_df: pd.DataFrame,
+        same_pool: bool = False,
+        candidate_mask: Optional[np.ndarray] = None,
+        from_features: Optional[FeatureStore] = None,
+        to_features: Optional[FeatureStore] = None,
+        pair_features: Optional[PairFeatures] = None,
     ):
-        super().__init__(config, from_df, to_df)
+        super().__init__(
+            config,
+            from_df,
+            to_df,
+            same_pool,
+            candidate_mask,
+            from_features,
+            to_features,
+            pair_features,
+        )
+
+    @staticmethod
+    def _matrix_columns(config: ScorerConfig) -> list[tuple[str, dict]]:
+        """List-valued embedding columns and their _score_matrix_similarity rules."""
+        return [
+            (
+                "hobbies_embeddings",
+                dict(
+                    reward_multiplier=config.hobbies_reward_multiplier,
+                    bonus_threshold=config.hobbies_bonus_threshold,
+                    bonus_multiplier=config.hobbies_bonus_multiplier,
+                ),
+            ),
+            (
+                "fav_movies_embeddings",
+                dict(
+                    reward_multiplier=config.fav_movies_reward_multiplier,
+                    bonus_threshold=config.fav_movies_bonus_threshold,
+                    bonus_multiplier=config.fav_movies_bonus_multiplier,
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def _vector_columns(config: ScorerConfig) -> list[tuple[str, dict]]:
+        """Single-vector embedding columns and their _score_vector_similarity rules."""
+        return [
+            (
+                "expectation_embeddings",
+                dict(
+                    reward_multiplier=config.expectation_reward_multiplier,
+                    thresholds=config.expectation_thresholds,
+                    bonus_multiplier=config.expectation_bonus_multiplier,
+                    penalty_multiplier=config.expectation_penalty_multiplier,
+                ),
+            ),
+            (
+                "weekend_arrangement_embeddings",
+                dict(
+                    reward_multiplier=config.weekend_arrangement_reward_multiplier,
+                    thresholds=config.weekend_arrangement_thresholds,
+                    bonus_multiplier=config.weekend_arrangement_bonus_multiplier,
+                    penalty_multiplier=config.weekend_arrangement_penalty_multiplier,
+                ),
+            ),
+            (
+                "wish_embeddings",
+                dict(
+                    reward_multiplier=config.wish_reward_multiplier,
+                    thresholds=(None, config.wish_bonus_threshold),
+                    bonus_multiplier=config.wish_bonus_multiplier,
+                    penalty_multiplier=None,
+                ),
+            ),
+        ]
+
+    def _encode_applicants(self) -> tuple[dict, dict]:
+        """
+        Encodes the embedding columns: single vectors become normalized
+        matrices, list-valued columns become padded item indices into one
+        item-to-item cosine table per column (see _encode_item_sets).
+        """
+        source, target = self.features()
+        from_arrays, to_arrays = {}, {}
+        for column, _ in self._matrix_columns(self.config):
+            from_items, to_items = _encode_item_sets(
+                *source.embedding_sets(column), *target.embedding_sets(column)
+            )
+            for key, value in from_items.items():
+                from_arrays[f"{column}:{key}"] = value
+            for key, value in to_items.items():
+                to_arrays[f"{column}:{key}"] = value
+        for column, _ in self._vector_columns(self.config):
+            from_arrays[column] = _normalize_rows(source.embedding_matrix(column))
+            to_arrays[column] = _normalize_rows(target.embedding_matrix(column))
+        return from_arrays, to_arrays
+
+    def _compute_pair_features(self) -> dict[str, np.ndarray]:
+        """
+        The cosine similarities every similarity term is a function of: per
+        list-valued column the best match of each from-item inside every
+        to-applicant (see _best_item_matches), per single-vector column the
+        (n, m) cosine matrix.
+        """
+        source, target = self.features()
+        features = {}
+        for column, _ in self._matrix_columns(self.config):
+            from_items, to_items = _encode_item_sets(
+                *source.embedding_sets(column), *target.embedding_sets(column)
+            )
+            best, offsets = _best_item_matches(
+                to_items["similarity"], from_items["items"], to_items["items"]
+            )
+            features[f"{column}:best"] = best
+            features[f"{column}:offsets"] = offsets
+        for column, _ in self._vector_columns(self.config):
+            features[f"{column}:similarity"] = (
+                _normalize_rows(source.embedding_matrix(column))
+                @ _normalize_rows(target.embedding_matrix(column)).T
+            )
+        return features
+
+    @staticmethod
+    def _combine_pair_features(config: ScorerConfig, features: PairFeatures) -> np.ndarray:
+        """_score_block over PairFeatures."""
+        vector_columns = SimilarityScorer._vector_columns(config)
+        score = np.full(
+            features[f"{vector_columns[0][0]}:similarity"].shape,
+            config.base_similarity_score,
+            dtype=np.float64,
+        )
+        for column, rules in SimilarityScorer._matrix_columns(config):
+            score += _sum_best_item_matches(
+                features[f"{column}:best"], features[f"{column}:offsets"], **rules
+            )
+        for column, rules in vector_columns:
+            score += SimilarityScorer._score_vector_similarity_matrix(
+                features[f"{column}:similarity"].astype(np.float64), **rules
+            )
+        return score
+
+    @staticmethod
+    def _score_block(
+        config: ScorerConfig, from_arrays: dict, to_arrays: dict
+    ) -> np.ndarray:
+        n = len(from_arrays["expectation_embeddings"])
+        m = len(to_arrays["expectation_embeddings"])
+        score = np.full((n, m), config.base_similarity_score, dtype=np.float64)
+
+        for column, rules in SimilarityScorer._matrix_columns(config):
+            score += _score_item_sets(
+                to_arrays[f"{column}:similarity"],
+                from_arrays[f"{column}:items"],
+                to_arrays[f"{column}:items"],
+                **rules,
+            )
+
+        for column, rules in SimilarityScorer._vector_columns(config):
+            similarity = (from_arrays[column] @ to_arrays[column].T).astype(np.float64)
+            score += SimilarityScorer._score_vector_similarity_matrix(
+                similarity, **rules
+            )
+        return score
+
+    @staticmethod
+    def _score_pairs(
+        config: ScorerConfig,
+        from_arrays: dict,
+        to_arrays: dict,
+        rows: np.ndarray,
+        cols: np.ndarray,
+    ) -> np.ndarray:
+        score = np.full(len(rows), config.base_similarity_score, dtype=np.float64)
+
+        for column, rules in SimilarityScorer._matrix_columns(config):
+            score += _score_item_pairs(
+                to_arrays[f"{column}:similarity"],
+                from_arrays[f"{column}:items"][rows],
+                to_arrays[f"{column}:items"][cols],
+                **rules,
+            )
+
+        # a GEMM over the rows / cols involved is cheaper than gathering
+        # one embedding pair per candidate
+        used_rows, row_position = np.unique(rows, return_inverse=True)
+        used_cols, col_position = np.unique(cols, return_inverse=True)
+        for column, rules in SimilarityScorer._vector_columns(config):
+            similarity = (
+                from_arrays[column][used_rows] @ to_arrays[column][used_cols].T
+            )[row_position, col_position].astype(np.float64)
+            score += SimilarityScorer._score_vector_similarity_matrix(
+                similarity, **rules
+            )
+        return score
+
+    @staticmethod
+    def _score_triangle_block(
+        config: ScorerConfig, from_arrays: dict, to_arrays: dict, start: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        n = len(from_arrays["expectation_embeddings"])
+        m = len(to_arrays["expectation_embeddings"]) - start
+        forward = np.full((n, m), config.base_similarity_score, dtype=np.float64)
+        backward = np.full((m, n), config.base_similarity_score, dtype=np.float64)
+
+        # In the same pool both sides share one item table, so the block's
+        # item sets can stand on either side of the cosine table
+        for column, rules in SimilarityScorer._matrix_columns(config):
+            similarity = to_arrays[f"{column}:similarity"]
+            block_items = from_arrays[f"{column}:items"]
+            pool_items = to_arrays[f"{column}:items"][start:]
+            forward += _score_item_sets(similarity, block_items, pool_items, **rules)
+            backward += _score_item_sets(similarity, pool_items, block_items, **rules)
+
+        for column, rules in SimilarityScorer._vector_columns(config):
+            similarity = (from_arrays[column] @ to_arrays[column][start:].T).astype(
+                np.float64
+            )
+            scores = SimilarityScorer._score_vector_similarity_matrix(
+                similarity, **rules
+            )
+            forward += scores
+            backward += scores.T
+        return forward, backward
+
+    @staticmethod
+    def _score_vector_similarity_matrix(
+        similarity: np.ndarray,
+        *,
+        reward_multiplier: float,
+        thresholds: Optional[Tuple[float, Optional[float]]],
+        bonus_multiplier: Optional[float],
+        penalty_multiplier: Optional[float],
+    ) -> np.ndarray:
+        """Element-wise version of _score_vector_similarity on a similarity matrix."""
+        score = similarity * reward_multiplier
+
+        lower_threshold = None
+        upper_threshold = None
+        if thresholds is not None:
+            lower_threshold, upper_threshold = thresholds
+
+        bonus = np.zeros(similarity.shape, dtype=bool)
+        if upper_threshold is not None and bonus_multiplier is not None:
+            bonus = similarity >= upper_threshold
+            score = np.where(bonus, score * bonus_multiplier, score)
+        if lower_threshold is not None and penalty_multiplier is not None:
+            penalty = ~bonus & (similarity < lower_threshold)
+            score = np.where(
+                penalty,
+                score * ((similarity - lower_threshold) * penalty_multiplier),
+                score,
+            )
+        return score
 
     def score_for_one(
         self, from_applicant: pd.Series, to_applicant: pd.Series
@@ -412,8 +1691,8 @@ class SimilarityScorer(Scorer):
 
         return score
 
+    @staticmethod
     def _score_matrix_similarity(
-        self,
         from_embeddings: np.ndarray,
         to_embeddings: np.ndarray,
         *,
@@ -428,8 +1707,8 @@ class SimilarityScorer(Scorer):
             scores[best_matches >= bonus_threshold] *= bonus_multiplier
         return float(np.sum(scores) / np.sqrt(max(len(best_matches)-2, 1)))
 
+    @staticmethod
     def _score_vector_similarity(
-        self,
         from_embedding: np.ndarray,
         to_embedding: np.ndarray,
         *,
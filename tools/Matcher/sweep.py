@@ -0,0 +1,285 @@
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from .aggregation import aggregate_scores
+from .features import FeatureStore
+from .matcher import Matcher
+from .pair_features import PairFeatures
+from .scorer import PreferenceScorer, ScorerConfig, SimilarityScorer
+
+# Sweep parameters that are not ScorerConfig fields, with the round 1 values
+AGGREGATION_DEFAULTS = {"max_score": 400, "minmax_ratio": 0.7}
+
+POOLS = ("heterosexual_female", "heterosexual_male", "homosexual_female", "homosexual_male")
+# score matrix -> (from pool, to pool)
+MATRICES = {
+    "FM": ("heterosexual_female", "heterosexual_male"),
+    "MF": ("heterosexual_male", "heterosexual_female"),
+    "FF": ("homosexual_female", "homosexual_female"),
+    "MM": ("homosexual_male", "homosexual_male"),
+}
+SCORERS = {"preference": PreferenceScorer, "similarity": SimilarityScorer}
+
+
+def grid(**values: list) -> list[dict]:
+    """
+    Every combination of the given values, e.g.
+    grid(mbti_multiplier=[0.3, 0.6], max_score=[400, 650]) -> 4 settings.
+    """
+    keys = list(values)
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values.values())]
+
+
+def random_search(n: int, seed: int | None = None, **ranges) -> list[dict]:
+    """
+    n random settings. A (low, high) tuple is sampled uniformly (as an int
+    when both ends are ints), a list is sampled from.
+    """
+    rng = random.Random(seed)
+
+    def sample(values):
+        if isinstance(values, tuple):
+            low, high = values
+            if isinstance(low, int) and isinstance(high, int):
+                return rng.randint(low, high)
+            return rng.uniform(low, high)
+        return rng.choice(values)
+
+    return [{key: sample(values) for key, values in ranges.items()} for _ in range(n)]
+
+
+def _match_pairs(final: np.ndarray, same_group_method: str | None) -> list[tuple[int, int]]:
+    """
+    The matched pairs with a positive score, as in the round notebooks:
+    hungarian() for a two-pool matrix (same_group_method=None), otherwise
+    max_weight_matching_same_group.
+    """
+    n, m = final.shape
+    if n == 0 or m == 0:
+        return []
+    matcher = Matcher(final)
+    if same_group_method is None:
+        result = matcher.hungarian()
+    else:
+        result = matcher.max_weight_matching_same_group(method=same_group_method)
+    return [(i, j) for i, j in result if i < n and j < m and final[i, j] > 0]
+
+
+def evaluate(
+    params: dict,
+    pair_features: dict[str, PairFeatures],
+    base_params: dict | None = None,
+    same_group_method: str = "blossom",
+) -> dict:
+    """
+    Scores, aggregates and matches all pools under one setting and returns
+    its metrics:
+        matched_pairs                 - pairs over all pools
+        mean_score, min_score         - final score of the matched pairs
+        unmatched_<pool>              - applicants left unmatched per pool
+        preferred_pairs               - pairs where one side put the other as
+                                        preferred_wxid
+        preferred_honored             - fraction of them that were matched
+
+    Args:
+        params: ScorerConfig fields plus max_score / minmax_ratio, on top of
+                base_params and AGGREGATION_DEFAULTS.
+        pair_features: "<matrix>_<scorer>" -> PairFeatures, e.g.
+                "FM_preference" (see ParameterSweep.prepare).
+    """
+    settings = {**AGGREGATION_DEFAULTS, **(base_params or {}), **params}
+    aggregation = {key: settings.pop(key) for key in AGGREGATION_DEFAULTS}
+    config = ScorerConfig(**settings)
+
+    scores = {
+        matrix: [
+            scorer.score_pair_features(
+                config, pair_features[f"{matrix}_{kind}"], same_pool=from_pool == to_pool
+            )
+            for kind, scorer in SCORERS.items()
+        ]
+        for matrix, (from_pool, to_pool) in MATRICES.items()
+    }
+
+    def preferred(matrix: str) -> np.ndarray:
+        return np.asarray(pair_features[f"{matrix}_preference"]["preferred"])
+
+    # (final matrix, same group, rows pool, columns pool, preferred pairs)
+    groups = [
+        (
+            aggregate_scores(*scores["FM"], *scores["MF"], **aggregation),
+            None,
+            "heterosexual_female",
+            "heterosexual_male",
+            preferred("FM") | preferred("MF").T,
+        ),
+    ]
+    for matrix in ("FF", "MM"):
+        # an unordered pair is requested when either side asked for it
+        requested = preferred(matrix) | preferred(matrix).T
+        groups.append(
+            (
+                aggregate_scores(*scores[matrix], **aggregation),
+                same_group_method,
+                MATRICES[matrix][0],
+                MATRICES[matrix][1],
+                np.triu(requested, k=1),
+            )
+        )
+
+    pair_scores, unmatched = [], {}
+    preferred_pairs = preferred_honored = 0
+    for final, method, rows_pool, columns_pool, requested in groups:
+        pairs = _match_pairs(final, method)
+        pair_scores += [final[i, j] for i, j in pairs]
+        if method is None:
+            unmatched[f"unmatched_{rows_pool}"] = final.shape[0] - len(pairs)
+            unmatched[f"unmatched_{columns_pool}"] = final.shape[1] - len(pairs)
+        else:
+            unmatched[f"unmatched_{rows_pool}"] = final.shape[0] - 2 * len(pairs)
+        preferred_pairs += int(requested.sum())
+        preferred_honored += sum(
+            bool(requested[min(i, j), max(i, j)] if method else requested[i, j]) for i, j in pairs
+        )
+
+    return {
+        **params,
+        "matched_pairs": len(pair_scores),
+        "mean_score": float(np.mean(pair_scores)) if pair_scores else np.nan,
+        "min_score": float(np.min(pair_scores)) if pair_scores else np.nan,
+        **unmatched,
+        "preferred_pairs": preferred_pairs,
+        "preferred_honored": preferred_honored / preferred_pairs if preferred_pairs else np.nan,
+    }
+
+
+# Module-level state for sweep worker processes (set by _init_sweep_worker)
+_sweep_worker = None
+
+
+def _init_sweep_worker(directory: str, base_params: dict | None, same_group_method: str) -> None:
+    global _sweep_worker
+    _sweep_worker = (ParameterSweep.load_pair_features(directory), base_params, same_group_method)
+
+
+def _evaluate_params(params: dict) -> dict:
+    return evaluate(params, *_sweep_worker)
+
+
+class ParameterSweep:
+    """
+    Evaluates many ScorerConfig / aggregation settings on the same four
+    pools. The raw pair features of all eight scorers (see Scorer.rescore)
+    are computed once and saved to directory; every setting is then only a
+    re-weighting of them plus one matching run, and workers memory-map the
+    same files instead of receiving copies.
+
+        sweep = ParameterSweep(heterosexual_female_df, heterosexual_male_df,
+                               homosexual_female_df, homosexual_male_df)
+        results = sweep.run(grid(mbti_multiplier=[0.3, 0.6], max_score=[400, 650]))
+        results.sort_values("mean_score", ascending=False)
+    """
+
+    def __init__(
+        self,
+        heterosexual_female_df: pd.DataFrame,
+        heterosexual_male_df: pd.DataFrame,
+        homosexual_female_df: pd.DataFrame,
+        homosexual_male_df: pd.DataFrame,
+        directory: str = "./sweep_features/",
+        base_params: dict | None = None,
+        same_group_method: str = "blossom",
+    ):
+        """
+        Args:
+            base_params: settings shared by every run (ScorerConfig fields,
+                         max_score, minmax_ratio); each run's params override
+                         them.
+            same_group_method: FF / MM matching method, see
+                         Matcher.max_weight_matching_same_group. The default
+                         "blossom" is exact but pure-Python networkx (about
+                         15 s per run at 600 applicants); "greedy" is much
+                         faster for wide grids on large pools.
+        """
+        self.pools = dict(
+            zip(POOLS, (heterosexual_female_df, heterosexual_male_df, homosexual_female_df, homosexual_male_df))
+        )
+        self.directory = directory
+        self.base_params = base_params
+        self.same_group_method = same_group_method
+
+    def prepare(self) -> None:
+        """
+        Computes the pair features that are missing from directory or no
+        longer match the pools.
+        """
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        stores = {pool: FeatureStore.from_dataframe(df) for pool, df in self.pools.items()}
+        for matrix, (from_pool, to_pool) in MATRICES.items():
+            for kind, scorer_class in SCORERS.items():
+                name = f"{matrix}_{kind}"
+                scorer = scorer_class(
+                    ScorerConfig(),
+                    self.pools[from_pool],
+                    self.pools[to_pool],
+                    same_pool=from_pool == to_pool,
+                    from_features=stores[from_pool],
+                    to_features=stores[to_pool],
+                )
+                fingerprint = scorer.data_fingerprint()
+                if manifest.get(name) == fingerprint:
+                    continue
+                print(f"Computing pair features of {name}")
+                scorer.compute_pair_features().save(os.path.join(self.directory, name))
+                manifest[name] = fingerprint
+                with open(manifest_path, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+
+    @staticmethod
+    def load_pair_features(directory: str) -> dict[str, PairFeatures]:
+        return {
+            f"{matrix}_{kind}": PairFeatures.load(os.path.join(directory, f"{matrix}_{kind}"))
+            for matrix in MATRICES
+            for kind in SCORERS
+        }
+
+    def run(self, params_list: list[dict], n_workers: int | None = None) -> pd.DataFrame:
+        """
+        Evaluates every setting of params_list (e.g. from grid or
+        random_search) in n_workers processes. Returns one row per setting:
+        its params followed by the metrics of evaluate.
+        """
+        self.prepare()
+        workers = min(n_workers or os.cpu_count() or 4, len(params_list))
+        if workers <= 1:
+            pair_features = self.load_pair_features(self.directory)
+            rows = [
+                evaluate(params, pair_features, self.base_params, self.same_group_method)
+                for params in tqdm(params_list, desc="Sweeping")
+            ]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_sweep_worker,
+                initargs=(self.directory, self.base_params, self.same_group_method),
+            ) as executor:
+                rows = list(
+                    tqdm(
+                        executor.map(_evaluate_params, params_list),
+                        total=len(params_list),
+                        desc="Sweeping",
+                    )
+                )
+        return pd.DataFrame(rows)
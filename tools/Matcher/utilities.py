@@ -1,31 +1,142 @@
 import pandas as pd
 from pandas import DataFrame
-from typing import Tuple
+from typing import Iterator, Tuple
 
+import json
 import sqlite3
 import os
+from contextlib import closing
+from urllib.parse import quote
+
+import numpy as np
+
+from .features import FeatureStore
 
 class MatchingUtilities:
+    # columns kept by prepare_data / selected by stream_applicants
+    columns = [
+        "id",
+        "sex",
+        "name",
+        "grade",
+        "wxid",
+        "school",
+        "timezone",
+        "location",
+        "mbti_ei",
+        "mbti_sn",
+        "mbti_tf",
+        "mbti_jp",
+        "preferred_sex",
+        "preferred_grades",
+        "preferred_schools",
+        "max_time_difference",
+        "same_location_only",
+        "preferred_mbti_ei",
+        "preferred_mbti_sn",
+        "preferred_mbti_tf",
+        "preferred_mbti_jp",
+        "preferred_wxid",
+        "continue_match",
+        "message_to_partner",
+        "comment",
+        "hobbies",
+        "fav_movies",
+        "wish",
+        "why_lamp_remembered_your_name",
+        "weekend_arrangement",
+        "reply_frequency",
+        "expectation",
+        "updated_at",
+    ]
+    # the conditions of filter_applicant, evaluated by SQLite
+    applicant_filter = (
+        "quitted = 0 AND exclude = 0 AND payment_id IS NOT NULL"
+        " AND grade != 'PROF' AND confirmed = 0"
+    )
 
     def __init__(self, path: str = "db.sqlite3", table_name: str = "applicant"):
         self.path = path
         self.table_name = table_name
 
+    def connect(self, immutable: bool = False) -> sqlite3.Connection:
+        """
+        Opens the database read-only, so the tools cannot modify the live
+        db.sqlite3. The backend runs SQLite in its default rollback journal
+        mode (WAL would leave its -wal file inside the container that holds
+        the bind-mounted db.sqlite3), so a running query holds a shared lock
+        and Django's commits wait until it finishes. Fine for short queries;
+        long reads should go through snapshot().
+
+        Args:
+            immutable (bool): Also skip locking and change detection. Only safe
+                              on a file nothing writes to and whose WAL is
+                              checkpointed (e.g. a copied snapshot); on the
+                              live database reads can tear or miss commits.
+        """
+        uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+        if immutable:
+            uri += "&immutable=1"
+        db = sqlite3.connect(uri, uri=True)
+        db.execute("PRAGMA query_only = ON")
+        return db
+
+    def snapshot(self) -> sqlite3.Connection:
+        """
+        An in-memory copy of the database, taken with the SQLite backup API
+        in one step: the live file is locked only while its pages are
+        copied, and every query on the copy sees the same state.
+        """
+        copy = sqlite3.connect(":memory:")
+        with closing(self.connect()) as db:
+            db.backup(copy)
+        copy.execute("PRAGMA query_only = ON")
+        return copy
+
     def connect_db_and_get_table(self, table_name: str) -> DataFrame:
         """
         Connects to a SQLite database and retrieves all data from the specified table.
 
         Args:
-            path (str): The file path to the SQLite database.
             table_name (str): The name of the table to retrieve data from.
 
         Returns:
             pd.DataFrame: A pandas DataFrame containing all data from the specified table.
         """
-        with sqlite3.connect(self.path) as db:
+        with closing(self.connect()) as db:
             df = pd.read_sql_query(f"SELECT * FROM {table_name}", db)
         return df
 
+    def stream_applicants(self, chunk_size: int = 1000, immutable: bool = False) -> Iterator[DataFrame]:
+        """
+        Yields the applicants filter_applicant would keep, prepared as by
+        prepare_data, in DataFrames of at most chunk_size rows. The filter
+        and the column projection run in SQLite, so only the needed columns
+        of the needed rows are ever read into Python. The chunks are read
+        from snapshot(), so a slow consumer never holds up Django's writes
+        and all of them see one consistent state of the database.
+
+        Args:
+            chunk_size (int): Rows fetched and converted at a time.
+            immutable (bool): Read the file directly instead of copying it,
+                              see connect.
+        """
+        query = f"SELECT {', '.join(self.columns)} FROM {self.table_name} WHERE {self.applicant_filter}"
+        with closing(self.connect(True) if immutable else self.snapshot()) as db:
+            cursor = db.execute(query)
+            while rows := cursor.fetchmany(chunk_size):
+                yield self.convert_types(DataFrame.from_records(rows, columns=self.columns))
+
+    def load_applicants(self, chunk_size: int = 1000, immutable: bool = False) -> DataFrame:
+        """
+        stream_applicants collected into one DataFrame; equivalent to
+        prepare_data(filter_applicant(connect_db_and_get_table(table_name))).
+        """
+        chunks = list(self.stream_applicants(chunk_size, immutable))
+        if not chunks:
+            return self.convert_types(DataFrame(columns=self.columns))
+        return pd.concat(chunks, ignore_index=True)
+
     def filter_applicant(self, data: DataFrame) -> DataFrame:
         """
         Filters out applicants who have either quit or are marked for exclusion.
@@ -53,57 +164,29 @@ class MatchingUtilities:
 
     def prepare_data(self, data: DataFrame) -> DataFrame:
         """
-        Prepares the input DataFrame by converting the created_at column to the local timezone,
-        and converting the timezone column to the local timezone.
+        Prepares the input DataFrame by keeping the columns used for matching
+        and converting them to the types the matcher expects (see
+        convert_types).
         Args:
             data (DataFrame): The input DataFrame containing applicant data.
         Returns:
             DataFrame: A DataFrame containing the prepared data.
         """
-        df = data[
-            [
-                "id",
-                "sex",
-                "name",
-                "grade",
-                "wxid",
-                "school",
-                "timezone",
-                "location",
-                "mbti_ei",
-                "mbti_sn",
-                "mbti_tf",
-                "mbti_jp",
-                "preferred_sex",
-                "preferred_grades",
-                "preferred_schools",
-                "max_time_difference",
-                "same_location_only",
-                "preferred_mbti_ei",
-                "preferred_mbti_sn",
-                "preferred_mbti_tf",
-                "preferred_mbti_jp",
-                "preferred_wxid",
-                "continue_match",
-                "message_to_partner",
-                "comment",
-                "hobbies",
-                "fav_movies",
-                "wish",
-                "why_lamp_remembered_your_name",
-                "weekend_arrangement",
-                "reply_frequency",
-                "expectation",
-            ]
-        ]
-        df["timezone"] = data["timezone"].map(lambda x: int(x[3:]))
-        df["preferred_grades"] = data["preferred_grades"].map(lambda x: x.split(" | "))
-        df["preferred_schools"] = data["preferred_schools"].map(
+        return self.convert_types(data[self.columns])
+
+    def convert_types(self, df: DataFrame) -> DataFrame:
+        """
+        Converts raw applicant columns in place: timezone "UTC+8" -> 8.0
+        (fractional offsets like "UTC+5.5" included), and the " | "-separated
+        preferred_grades, preferred_schools, hobbies and fav_movies to lists.
+        """
+        df["timezone"] = df["timezone"].map(lambda x: float(x[3:]))
+        df["preferred_grades"] = df["preferred_grades"].map(lambda x: x.split(" | "))
+        df["preferred_schools"] = df["preferred_schools"].map(
             lambda x: x.split(" | ")
         )
-        df["hobbies"] = data["hobbies"].map(lambda x: [text.strip() for text in x.split(" | ")])
-        df["fav_movies"] = data["fav_movies"].map(lambda x: [text.strip() for text in x.split(" | ")])
-        
+        df["hobbies"] = df["hobbies"].map(lambda x: [text.strip() for text in x.split(" | ")])
+        df["fav_movies"] = df["fav_movies"].map(lambda x: [text.strip() for text in x.split(" | ")])
         return df
 
     def separate_groups(
@@ -155,22 +238,242 @@ class MatchingUtilities:
                 - homosexual_female_list: Users who are female and prefer females.
                 - homosexual_male_list: Users who are male and prefer males.
         """
-        df = self.connect_db_and_get_table(self.table_name)
-        df = self.filter_applicant(df)
-        df = self.prepare_data(df)
+        df = self.load_applicants()
         # df = self.reshuffle_data(df)
         return self.separate_groups(df)
 
+class IdIndex:
+    """
+    id -> (pool, row) of every applicant of a set of pools, for turning
+    applicant ids (discarded matches, no-response lists, ...) into matrix
+    indices with one vectorized lookup instead of a scan per id.
+
+    Build it from DataFrames with from_pools, or load the one DataLoader
+    keeps next to its pools (DataLoader.load_id_index).
+    """
+
+    def __init__(self, frame: DataFrame):
+        """
+        Args:
+            frame: columns id, pool, row; ids are unique across pools.
+        """
+        self.frame = frame.reset_index(drop=True)
+        self._ids = pd.Index(self.frame["id"])
+        if not self._ids.is_unique:
+            raise ValueError("Applicant ids must be unique across pools")
+        self._pools = self.frame["pool"].to_numpy(dtype=object)
+        self._rows = self.frame["row"].to_numpy(dtype=np.int64)
+
+    @classmethod
+    def from_pools(cls, pools: dict[str, DataFrame]) -> "IdIndex":
+        """pools: pool name -> DataFrame with an id column, rows in matrix order."""
+        return cls(pd.concat([_pool_ids(name, df["id"]) for name, df in pools.items()], ignore_index=True))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def ids(self, pool: str) -> np.ndarray:
+        """The ids of pool in row order."""
+        in_pool = self._pools == pool
+        ids = self._ids.to_numpy()[in_pool]
+        return ids[np.argsort(self._rows[in_pool], kind="stable")]
+
+    def locate(self, ids) -> Tuple[np.ndarray, np.ndarray]:
+        """(pool, row) of every id; None and -1 for ids not in the index."""
+        positions = self._ids.get_indexer(list(ids))
+        found = positions >= 0
+        pools = np.where(found, self._pools[positions], None)
+        rows = np.where(found, self._rows[positions], -1)
+        return pools, rows
+
+    def rows(self, ids, pool: str) -> np.ndarray:
+        """Rows of the ids that are in pool; the others are left out."""
+        pools, rows = self.locate(ids)
+        return rows[pools == pool]
+
+    def pairs(self, ids1, ids2, rows_pool: str, columns_pool: str) -> np.ndarray:
+        """
+        (k, 2) array of (row in rows_pool, row in columns_pool) for the pairs
+        (ids1[p], ids2[p]) that fall in that matrix, in either order; pairs
+        of any other two pools are left out.
+        """
+        pools1, rows1 = self.locate(ids1)
+        pools2, rows2 = self.locate(ids2)
+        forward = (pools1 == rows_pool) & (pools2 == columns_pool)
+        pairs = [np.stack([rows1[forward], rows2[forward]], axis=1)]
+        if rows_pool != columns_pool:
+            backward = (pools1 == columns_pool) & (pools2 == rows_pool)
+            pairs.append(np.stack([rows2[backward], rows1[backward]], axis=1))
+        return np.concatenate(pairs).astype(np.int64)
+
+    def unknown(self, ids) -> list:
+        """The ids that are in none of the pools."""
+        ids = list(ids)
+        return [ids[i] for i in np.flatnonzero(self._ids.get_indexer(ids) < 0)]
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    """
+    np.save through a temporary file. The frame being saved may still hold
+    memory-mapped views of the file at path (load_data), and overwriting
+    it in place would pull the pages out from under them.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _pool_ids(name: str, ids: pd.Series) -> DataFrame:
+    return DataFrame({"id": ids.to_numpy(), "pool": name, "row": np.arange(len(ids), dtype=np.int64)})
+
+
 class DataLoader:
+    """
+    Saves / loads embedded pools. A pool is stored as a directory:
+        scalars.parquet         - every non-embedding column
+        <column>.npy            - fixed-size embeddings as one (n, dim) matrix
+        <column>.npy + <column>.offsets.npy
+                                - ragged embeddings (e.g. hobbies) as one flat
+                                  (total, dim) matrix; row i owns
+                                  flat[offsets[i]:offsets[i + 1]]
+        manifest.json           - which columns are which
+        features.npz / .json    - the pool's compiled FeatureStore
+    plus id_index.parquet next to the pools, the IdIndex of all of them.
+    The matrices are opened with mmap_mode="r", so the embedding cells of a
+    loaded DataFrame are views into pages shared by every process that maps
+    the same files. Pools saved as .pkl by older versions still load.
+    """
+
     def __init__(self, path: str = "./embedded_data/"):
         if not os.path.exists(path):
             os.makedirs(path)
         self.path = path
-    
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, name, "manifest.json")) or os.path.exists(
+            self.path + name + ".pkl"
+        )
+
     def load_data(self, name: str) -> DataFrame:
-        return pd.read_pickle(self.path + name + ".pkl")
-    
-    def save_data(self, df: DataFrame, name: str) -> None:
-        df.to_pickle(self.path + name + ".pkl")
-        print(f"Saved DataFrame to {self.path + name + ".pkl"}")
+        directory = os.path.join(self.path, name)
+        if not os.path.exists(os.path.join(directory, "manifest.json")):
+            return pd.read_pickle(self.path + name + ".pkl")
+
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        df = pd.read_parquet(os.path.join(directory, "scalars.parquet"))
+        for column in manifest["list_columns"]:
+            df[column] = df[column].map(list)
+        for column, kind in manifest["embedding_columns"].items():
+            matrix, offsets = self.load_embeddings(name, column)
+            if kind == "ragged":
+                df[column] = [matrix[offsets[i] : offsets[i + 1]] for i in range(len(df))]
+            else:
+                df[column] = [matrix[i] for i in range(len(df))]
+        return df[manifest["columns"]]
+
+    def load_embeddings(self, name: str, column: str) -> Tuple[np.ndarray, np.ndarray | None]:
+        """
+        Memory-mapped embedding matrix of one column, plus its offsets for a
+        ragged column (None otherwise).
+        """
+        directory = os.path.join(self.path, name)
+        matrix = np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+        offsets_path = os.path.join(directory, f"{column}.offsets.npy")
+        offsets = np.load(offsets_path) if os.path.exists(offsets_path) else None
+        return matrix, offsets
+
+    def load_id_index(self) -> IdIndex:
+        """
+        id -> (pool, row) of every saved pool. save_data keeps it up to
+        date; for pools saved by older versions it is built (and saved) on
+        first use.
+        """
+        path = os.path.join(self.path, "id_index.parquet")
+        if not os.path.exists(path):
+            names = sorted(
+                name[: -len(".pkl")] if name.endswith(".pkl") else name
+                for name in os.listdir(self.path)
+                if name.endswith(".pkl") or os.path.exists(os.path.join(self.path, name, "manifest.json"))
+            )
+            for name in names:
+                self._update_id_index(name, self.load_data(name)["id"])
+            if not names:
+                return IdIndex(DataFrame({"id": [], "pool": [], "row": []}))
+        return IdIndex(pd.read_parquet(path))
+
+    def _update_id_index(self, name: str, ids: pd.Series) -> None:
+        path = os.path.join(self.path, "id_index.parquet")
+        frames = [_pool_ids(name, ids)]
+        if os.path.exists(path):
+            index = pd.read_parquet(path)
+            frames.insert(0, index[index["pool"] != name])
+        tmp_path = path + ".tmp"
+        pd.concat(frames, ignore_index=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def load_features(self, name: str) -> FeatureStore:
+        """
+        The FeatureStore saved with the pool (compiled on the fly for pools
+        pickled by older versions).
+        """
+        directory = os.path.join(self.path, name)
+        if not os.path.exists(os.path.join(directory, "features.npz")):
+            return FeatureStore.from_dataframe(self.load_data(name))
+        return FeatureStore.load(directory)
+
+    def save_data(
+        self, df: DataFrame, name: str, dtype: np.dtype | None = None, features: bool = True
+    ) -> None:
+        """
+        Args:
+            dtype: dtype of the stored embeddings, e.g. np.float16 to halve
+                   their size; defaults to the dtype they have.
+            features: also compile and save the pool's FeatureStore; turn it
+                   off when it is built separately (see Matcher.pipeline).
+        """
+        directory = os.path.join(self.path, name)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        embedding_columns, list_columns = {}, []
+        for column in df.columns:
+            values = df[column]
+            if len(values) and all(isinstance(value, np.ndarray) for value in values):
+                embedding_columns[column] = "ragged" if values.iloc[0].ndim == 2 else "matrix"
+            elif len(values) and all(isinstance(value, list) for value in values):
+                list_columns.append(column)
+
+        for column, kind in embedding_columns.items():
+            if kind == "ragged":
+                lengths = [len(value) for value in df[column]]
+                offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+                _save_npy(os.path.join(directory, f"{column}.offsets.npy"), offsets)
+                matrix = np.concatenate(list(df[column]))
+            else:
+                matrix = np.stack(list(df[column]))
+            _save_npy(os.path.join(directory, f"{column}.npy"), matrix.astype(dtype or matrix.dtype))
+
+        if features:
+            # the matrices written above are the store's embeddings
+            FeatureStore.from_dataframe(df).save(directory, embeddings=False)
+        elif os.path.exists(os.path.join(directory, "features.npz")):
+            # stale now; load_features compiles the pool until it is rebuilt
+            os.remove(os.path.join(directory, "features.npz"))
+        df.drop(columns=list(embedding_columns)).to_parquet(
+            os.path.join(directory, "scalars.parquet"), index=False
+        )
+        with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "columns": list(df.columns),
+                    "embedding_columns": embedding_columns,
+                    "list_columns": list_columns,
+                },
+                f,
+            )
+        if "id" in df.columns:
+            self._update_id_index(name, df["id"])
+        print(f"Saved DataFrame to {directory}")
         return df
\ No newline at end of file
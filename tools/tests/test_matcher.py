@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment
+
+from Matcher.matcher import Matcher
+
+
+def optimal_weight(scores: np.ndarray) -> float:
+    """Max-score assignment over the positive scores."""
+    gains = np.where(scores > 0, scores, 0.0)
+    rows, cols = linear_sum_assignment(gains, maximize=True)
+    return gains[rows, cols].sum()
+
+
+def matched_weight(scores: np.ndarray, pairs: list[tuple[int, int]]) -> float:
+    n, m = scores.shape
+    return sum(scores[i, j] for i, j in pairs if i < n and j < m and scores[i, j] > 0)
+
+
+def random_scores(rng: np.random.Generator, n: int, m: int, kind: str) -> np.ndarray:
+    if kind == "low_rank":
+        # similar applicants rank the same partners highest, so the top k
+        # of many rows overlap and a small k is not enough
+        scores = rng.random((n, 4)) @ rng.random((m, 4)).T * 40 + rng.normal(0, 10, (n, m))
+    else:
+        scores = rng.normal(0, 5, (n, m))
+    scores[rng.random((n, m)) < 0.3] = -np.inf
+    return scores
+
+
+@pytest.mark.parametrize("kind", ["low_rank", "normal"])
+@pytest.mark.parametrize("k", [1, 3, 10])
+@pytest.mark.parametrize("is_sparse", [False, True])
+def test_hungarian_top_k_matches_linear_sum_assignment(kind, k, is_sparse):
+    rng = np.random.default_rng(k)
+    for _ in range(20):
+        n, m = rng.integers(1, 60, 2)
+        scores = random_scores(rng, n, m, kind)
+        matcher = Matcher(sparse.csr_matrix(np.where(scores > 0, scores, 0)) if is_sparse else scores)
+
+        pairs = matcher.hungarian_top_k(k=k, max_gap=0)
+
+        optimum = optimal_weight(scores)
+        assert matched_weight(scores, pairs) == pytest.approx(optimum, rel=1e-9, abs=1e-9)
+        assert matcher.stats["weight"] == pytest.approx(optimum, rel=1e-9, abs=1e-9)
+        assert matcher.stats["upper_bound"] == pytest.approx(optimum, rel=1e-9, abs=1e-9)
+        # a permutation of the padded square, as hungarian() returns
+        size = max(n, m)
+        assert sorted(i for i, _ in pairs) == list(range(size))
+        assert sorted(j for _, j in pairs) == list(range(size))
+
+
+def test_hungarian_top_k_only_widens_violating_rows():
+    rng = np.random.default_rng(0)
+    scores = random_scores(rng, 200, 200, "low_rank")
+    matcher = Matcher(scores)
+
+    matcher.hungarian_top_k(k=5, max_gap=0)
+
+    assert matcher.stats["weight"] == pytest.approx(optimal_weight(scores), rel=1e-9)
+    assert matcher.stats["edges"] < np.count_nonzero(scores > 0)
+
+
+def test_assignment_duals_are_optimal():
+    rng = np.random.default_rng(1)
+    scores = rng.normal(0, 5, (30, 40))
+    rows, cols = np.nonzero(scores > 0)
+    data = scores[rows, cols]
+    pairs = Matcher._assign_edges(30, 40, rows, cols, data)
+
+    u, v = Matcher._assignment_duals(30, 40, rows, cols, data, pairs)
+
+    assert (u >= 0).all() and (v >= 0).all()
+    assert (u[rows] + v[cols] >= data - 1e-9).all()
+    assert u.sum() + v.sum() == pytest.approx(optimal_weight(scores), rel=1e-12)
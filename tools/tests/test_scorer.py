@@ -0,0 +1,218 @@
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Matcher.aggregation import aggregate_scores
+from Matcher.scorer import PreferenceScorer, ScorerConfig, SimilarityScorer
+
+GRADES = ["UG1", "UG2", "UG3", "UG4", "UG5", "MS", "PHD", "GRAD"]
+SCHOOLS = ["UST", "HKU", "CUHK"]
+LOCATIONS = ["HK", "SZ", "GD", "CN", "TW", "JP_KR", "ASIA", "OCEANIA", "UK", "EU", "US", "CA", "NA", "OTHER"]
+MBTI = [("e", "i", "x"), ("s", "n", "x"), ("t", "f", "x"), ("j", "p", "x")]
+
+# non-default thresholds, bonuses and penalties, so every branch of the
+# scoring is taken
+CONFIGS = [
+    ScorerConfig(),
+    ScorerConfig(
+        base_preference_score=100,
+        unqualified_penalty=-50,
+        mbti_multiplier=0.6,
+        grade_difference_penalty_multiplier_threshold=1,
+        hobbies_bonus_threshold=0.3,
+        expectation_thresholds=(0.1, 0.4),
+        wish_bonus_threshold=0.2,
+        fav_movies_bonus_multiplier=7,
+        reply_frequency_reward={"1": 3, "2": 0, "3": 1, "4": 2, "5": -2},
+    ),
+]
+
+
+def make_pool(n: int, sex: str, preferred_sex: str, seed: int, dim: int = 16) -> pd.DataFrame:
+    """n applicants as MatchingUtilities.prepare_data and EmbeddingUtilities leave them."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for k in range(n):
+        row = {
+            "id": str(uuid.UUID(int=int(rng.integers(0, 2**63)))),
+            "sex": sex,
+            "name": f"name{k}",
+            "grade": rng.choice(GRADES),
+            "wxid": f"wxid_{sex}{preferred_sex}_{seed}_{k}",
+            "school": rng.choice(SCHOOLS),
+            "timezone": int(rng.choice([8, 8, 8, 9, 0, 1, -5, -8, 10])),
+            "location": rng.choice(LOCATIONS),
+            "mbti_ei": int(rng.integers(0, 101)),
+            "mbti_sn": int(rng.integers(0, 101)),
+            "mbti_tf": int(rng.integers(0, 101)),
+            "mbti_jp": int(rng.integers(0, 101)),
+            "preferred_sex": preferred_sex,
+            "preferred_grades": list(rng.choice(GRADES, size=int(rng.integers(3, 9)), replace=False)),
+            "preferred_schools": list(rng.choice(SCHOOLS, size=int(rng.integers(1, 4)), replace=False)),
+            "max_time_difference": int(rng.integers(0, 13)),
+            "same_location_only": int(rng.random() < 0.2),
+            "preferred_mbti_ei": rng.choice(MBTI[0]),
+            "preferred_mbti_sn": rng.choice(MBTI[1]),
+            "preferred_mbti_tf": rng.choice(MBTI[2]),
+            "preferred_mbti_jp": rng.choice(MBTI[3]),
+            "preferred_wxid": None,
+            "continue_match": int(rng.random() > 0.05),
+            "reply_frequency": str(rng.integers(1, 6)),
+            "hobbies_embeddings": rng.normal(size=(int(rng.integers(1, 7)), dim)).astype(np.float32),
+            "fav_movies_embeddings": rng.normal(size=(int(rng.integers(1, 5)), dim)).astype(np.float32),
+        }
+        for column in ("expectation", "weekend_arrangement", "wish", "why_lamp_remembered_your_name"):
+            row[f"{column}_embeddings"] = rng.normal(size=dim).astype(np.float32)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="module")
+def pools() -> dict[str, pd.DataFrame]:
+    female = make_pool(50, "F", "M", seed=1)
+    male = make_pool(60, "M", "F", seed=2)
+    same = make_pool(40, "F", "F", seed=3)
+    # some preferred_wxid pairs, scored as preferred_wxid_value
+    female.loc[:4, "preferred_wxid"] = list(male["wxid"][:5])
+    male.loc[:2, "preferred_wxid"] = list(female["wxid"][10:13])
+    same.loc[:2, "preferred_wxid"] = list(same["wxid"][5:8])
+    return {"FM": female, "MF": male, "FF": same}
+
+
+@pytest.fixture(scope="module")
+def candidate_mask() -> np.ndarray:
+    return np.random.default_rng(0).random((50, 60)) < 0.3
+
+
+def assert_scores_equal(scorer_class: type, actual: np.ndarray, expected: np.ndarray) -> None:
+    """Preference scores agree exactly; similarities are summed in another order."""
+    if scorer_class is PreferenceScorer:
+        np.testing.assert_array_equal(actual, expected)
+        return
+    np.testing.assert_array_equal(np.isfinite(actual), np.isfinite(expected))
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-4)
+
+
+@pytest.mark.parametrize("scorer_class", [PreferenceScorer, SimilarityScorer])
+@pytest.mark.parametrize("config", CONFIGS)
+@pytest.mark.parametrize("same_pool", [False, True])
+def test_vectorized_matches_score_for_one(pools, scorer_class, config, same_pool):
+    from_df, to_df = (pools["FF"], pools["FF"]) if same_pool else (pools["FM"], pools["MF"])
+    per_cell = scorer_class(config, from_df, to_df, same_pool=same_pool).calculate_score_matrix(
+        n_workers=2, vectorized=False
+    )
+    vectorized = scorer_class(config, from_df, to_df, same_pool=same_pool).calculate_score_matrix(
+        n_workers=1, chunk_size=16
+    )
+    assert_scores_equal(scorer_class, vectorized, per_cell)
+
+
+@pytest.mark.parametrize("scorer_class", [PreferenceScorer, SimilarityScorer])
+def test_candidate_mask(pools, candidate_mask, scorer_class):
+    from_df, to_df = pools["FM"], pools["MF"]
+    per_cell = scorer_class(CONFIGS[0], from_df, to_df, candidate_mask=candidate_mask).calculate_score_matrix(
+        n_workers=2, vectorized=False
+    )
+    vectorized = scorer_class(CONFIGS[0], from_df, to_df, candidate_mask=candidate_mask).calculate_score_matrix(
+        n_workers=1, chunk_size=16
+    )
+    assert_scores_equal(scorer_class, vectorized, per_cell)
+
+    # inside the mask the scores are those of an unmasked run
+    unmasked = scorer_class(CONFIGS[0], from_df, to_df).calculate_score_matrix(n_workers=1, chunk_size=16)
+    assert np.all(vectorized[~candidate_mask] == -np.inf)
+    np.testing.assert_array_equal(vectorized[candidate_mask], unmasked[candidate_mask])
+
+
+@pytest.mark.parametrize("scorer_class", [PreferenceScorer, SimilarityScorer])
+@pytest.mark.parametrize("masked", [False, True])
+def test_sparse_matches_dense(pools, candidate_mask, scorer_class, masked):
+    mask = candidate_mask if masked else None
+    scorer = scorer_class(CONFIGS[1], pools["FM"], pools["MF"], candidate_mask=mask)
+    dense = scorer.calculate_score_matrix(n_workers=1, chunk_size=16).copy()
+    matrix = scorer.calculate_sparse_score_matrix(n_workers=1, chunk_size=16)
+
+    # every finite score is stored, explicit zeros included
+    coo = matrix.tocoo()
+    stored = np.zeros(dense.shape, dtype=bool)
+    stored[coo.row, coo.col] = True
+    np.testing.assert_array_equal(stored, np.isfinite(dense))
+    np.testing.assert_array_equal(coo.data, dense[coo.row, coo.col])
+
+
+def test_sparse_aggregation_matches_dense(pools, candidate_mask):
+    female, male = pools["FM"], pools["MF"]
+    matrices = {}
+    for name, from_df, to_df, mask in (
+        ("forward", female, male, candidate_mask),
+        ("backward", male, female, candidate_mask.T),
+    ):
+        for scorer_class in (PreferenceScorer, SimilarityScorer):
+            scorer = scorer_class(CONFIGS[0], from_df, to_df, candidate_mask=mask)
+            matrices[name, scorer_class, "dense"] = scorer.calculate_score_matrix(n_workers=1).copy()
+            matrices[name, scorer_class, "sparse"] = scorer.calculate_sparse_score_matrix(n_workers=1)
+
+    def aggregate(kind: str):
+        return aggregate_scores(
+            matrices["forward", PreferenceScorer, kind],
+            matrices["forward", SimilarityScorer, kind],
+            matrices["backward", PreferenceScorer, kind],
+            matrices["backward", SimilarityScorer, kind],
+            max_score=650,
+            minmax_ratio=0.7,
+        )
+
+    np.testing.assert_allclose(aggregate("sparse").toarray(), aggregate("dense"), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("scorer_class", [PreferenceScorer, SimilarityScorer])
+@pytest.mark.parametrize("same_pool", [False, True])
+def test_rescore_matches_full_run(pools, scorer_class, same_pool):
+    from_df, to_df = (pools["FF"], pools["FF"]) if same_pool else (pools["FM"], pools["MF"])
+    scorer = scorer_class(CONFIGS[0], from_df, to_df, same_pool=same_pool)
+    for config in CONFIGS:
+        full = scorer_class(config, from_df, to_df, same_pool=same_pool).calculate_score_matrix(n_workers=1)
+        assert_scores_equal(scorer_class, scorer.rescore(config), full)
+
+
+@pytest.mark.parametrize("scorer_class", [PreferenceScorer, SimilarityScorer])
+def test_checkpoint_resume(tmp_path, pools, scorer_class):
+    from_df, to_df = pools["FM"], pools["MF"]
+    fresh = scorer_class(CONFIGS[1], from_df, to_df).calculate_score_matrix(n_workers=1, chunk_size=16)
+    directory = str(tmp_path / "checkpoint")
+    scorer_class(CONFIGS[1], from_df, to_df).calculate_score_matrix(
+        n_workers=1, chunk_size=16, checkpoint=directory
+    )
+
+    # interrupt the run after its first block: only block (0, 16) is
+    # recorded, the rows of the others hold garbage
+    manifest_path = os.path.join(directory, "manifest.json")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["completed_blocks"] = [[0, 16]]
+    manifest["complete"] = False
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    matrix = np.load(os.path.join(directory, "score_matrix.npy"), mmap_mode="r+")
+    matrix[16:] = np.nan
+    matrix.flush()
+    del matrix
+
+    resumed = scorer_class(CONFIGS[1], from_df, to_df).calculate_score_matrix(
+        n_workers=1, chunk_size=16, checkpoint=directory
+    )
+    np.testing.assert_array_equal(resumed, fresh)
+    with open(manifest_path, encoding="utf-8") as f:
+        assert json.load(f)["complete"]
+
+    # a different config does not reuse the checkpoint
+    other = scorer_class(CONFIGS[0], from_df, to_df).calculate_score_matrix(
+        n_workers=1, chunk_size=16, checkpoint=directory
+    )
+    np.testing.assert_array_equal(
+        other, scorer_class(CONFIGS[0], from_df, to_df).calculate_score_matrix(n_workers=1, chunk_size=16)
+    )